@@ -0,0 +1,151 @@
+from pymongo import MongoClient
+import argparse
+import os
+import sys
+import time
+import resource
+import threading
+import subprocess
+
+from footprints.cache_pdet import obtener_indice_pdet
+from footprints.memoria_compartida import publicar_grilla
+from footprints.perfilador import perfilar
+
+# Configuración
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://mongo-upme:27017/')
+DB_NAME = os.getenv('DB_NAME', 'dba_proyectofinal')
+PDET_COLLECTION = 'mgn_municipios_pdet'
+PDET_CACHE_DIR = os.getenv('PDET_CACHE_DIR', 'cache/pdet')
+GRID_CELL_DEG = float(os.getenv('PDET_GRID_CELL_DEG', '0.01'))
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+CARGADORES = {
+    'google': os.path.join(DIRECTORIO, 'cargar_google_footprints.py'),
+    'microsoft': os.path.join(DIRECTORIO, 'cargar_microsoft_footprints.py'),
+}
+
+parser = argparse.ArgumentParser(
+    description='Carga Google y Microsoft footprints en paralelo con un único índice PDET compartido')
+parser.add_argument('--fuentes', nargs='+', choices=sorted(CARGADORES), default=['google', 'microsoft'],
+                    help='Cargadores a ejecutar en simultáneo (default: ambos)')
+parser.add_argument('--workers', type=int, default=int(os.getenv('ETL_WORKERS', '1')),
+                    help='Procesos de cada cargador (default: ETL_WORKERS o 1)')
+parser.add_argument('--writers', type=int, default=int(os.getenv('ETL_WRITERS', '1')),
+                    help='Hilos de escritura de cada cargador (default: ETL_WRITERS o 1)')
+parser.add_argument('--write-queue', type=int, default=int(os.getenv('ETL_WRITE_QUEUE', '4')),
+                    help='Batches en espera de escritura de cada cargador; con dos cargadores sobre '
+                         'el mismo mongod limita la memoria de ambos (default: ETL_WRITE_QUEUE o 4)')
+parser.add_argument('--resume', action='store_true', help='Se pasa a cada cargador')
+parser.add_argument('--incremental', action='store_true', help='Se pasa a cada cargador')
+parser.add_argument('--prune', action='store_true', help='Se pasa a cada cargador')
+parser.add_argument('--google', nargs='+', default=[], metavar='ENTRADA',
+                    help='Entradas de cargar_google_footprints.py (default: GOOGLE_INPUT_FILE)')
+args = parser.parse_args()
+perfilar('cargar_footprints')
+if args.prune and not args.incremental:
+    parser.error('--prune solo se puede usar con --incremental')
+if len(args.fuentes) > 1:
+    # Con un solo archivo, los cargadores se pisarían el checkpoint y el dead-letter
+    for variable in ('ETL_CHECKPOINT_FILE', 'ETL_DEAD_LETTER_FILE'):
+        if os.getenv(variable):
+            parser.error(f'{variable} no se puede compartir entre cargadores concurrentes; '
+                         f'usa el default por colección')
+
+print("="*60)
+print("CARGA CONCURRENTE DE BUILDING FOOTPRINTS - SOLO PDET")
+print(f"Fuentes: {', '.join(args.fuentes)}")
+print("="*60)
+
+# 1. Índice PDET: una sola vez, para todos los cargadores
+try:
+    client = MongoClient(MONGO_URI)
+    pdet_collection = client[DB_NAME][PDET_COLLECTION]
+    grilla_pdet, construida, segundos = obtener_indice_pdet(pdet_collection, PDET_CACHE_DIR, GRID_CELL_DEG)
+    client.close()
+except Exception as e:
+    print(f"✗ ERROR al cargar municipios PDET: {e}")
+    exit(1)
+
+if grilla_pdet is None:
+    print("✗ ERROR: No hay municipios PDET en la base de datos.")
+    print("  Ejecuta primero: python3 /app/scripts/create_mgn_municipios_pdet.py")
+    exit(1)
+
+print(f"✓ Índice PDET {'construido y guardado' if construida else 'abierto'} en {segundos:.2f} s "
+      f"({len(grilla_pdet.indice_pdet)} municipios)")
+
+# Los cargadores y sus workers leen la grilla de este bloque sin copiarla
+shm = publicar_grilla(grilla_pdet)
+print(f"✓ Índice en memoria compartida: {shm.name} ({shm.size / 1e6:.1f} MB)")
+
+
+def reenviar_salida(fuente, proceso):
+    """Copia la salida del cargador a la propia, con la fuente como prefijo."""
+    for linea in proceso.stdout:
+        sys.stdout.write(f"[{fuente}] {linea}")
+        sys.stdout.flush()
+
+
+def comando(fuente):
+    cmd = [sys.executable, CARGADORES[fuente], '--workers', str(args.workers),
+           '--writers', str(args.writers), '--write-queue', str(args.write_queue)]
+    cmd += [opcion for opcion, activa in (('--resume', args.resume), ('--incremental', args.incremental),
+                                         ('--prune', args.prune)) if activa]
+    if fuente == 'google':
+        cmd += args.google
+    return cmd
+
+
+# 2. Lanzar los cargadores en simultáneo
+entorno = dict(os.environ, PDET_SHM_NAME=shm.name, PYTHONUNBUFFERED='1')
+inicio = time.perf_counter()
+procesos = {}
+hilos = []
+duraciones = {}
+try:
+    for fuente in args.fuentes:
+        procesos[fuente] = subprocess.Popen(comando(fuente), env=entorno, stdout=subprocess.PIPE,
+                                            stderr=subprocess.STDOUT, text=True, bufsize=1)
+        hilo = threading.Thread(target=reenviar_salida, args=(fuente, procesos[fuente]), daemon=True)
+        hilo.start()
+        hilos.append(hilo)
+        print(f"✓ {fuente}: PID {procesos[fuente].pid}")
+
+    pendientes = dict(procesos)
+    while pendientes:
+        for fuente, proceso in list(pendientes.items()):
+            if proceso.poll() is not None:
+                duraciones[fuente] = time.perf_counter() - inicio
+                del pendientes[fuente]
+        time.sleep(0.2)
+    for hilo in hilos:
+        hilo.join()
+except KeyboardInterrupt:
+    print("\n⚠ Interrumpido: deteniendo cargadores...")
+    for proceso in procesos.values():
+        proceso.terminate()
+    for proceso in procesos.values():
+        proceso.wait()
+finally:
+    shm.close()
+    shm.unlink()
+
+total = time.perf_counter() - inicio
+# ru_maxrss de los hijos es el del proceso más grande (KB en Linux)
+pico_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+print("\n" + "="*60)
+print("RESUMEN DE LA CARGA CONCURRENTE")
+print("="*60)
+fallidos = []
+for fuente, proceso in procesos.items():
+    estado = '✓' if proceso.returncode == 0 else '✗'
+    if proceso.returncode != 0:
+        fallidos.append(fuente)
+    print(f"  {estado} {fuente}: código {proceso.returncode}, {duraciones.get(fuente, total):.1f} s")
+print(f"  Tiempo total: {total:.1f} s")
+print(f"  Pico de memoria del mayor proceso hijo: {pico_mb:,.0f} MB")
+
+if fallidos:
+    print(f"✗ Fallaron: {', '.join(fallidos)}")
+    exit(1)
+print("✓ CARGA CONCURRENTE COMPLETADA")
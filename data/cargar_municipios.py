@@ -16,6 +16,9 @@ from shapely.ops import transform
 from pyproj import Transformer
 from tqdm import tqdm
 
+from footprints.geometria import normalizar_geometrias
+from footprints.perfilador import perfilar
+
 # Config
 ZIP_PATH = os.getenv("MGN_ZIP_PATH", "/app/MGN2024_00_COLOMBIA.zip")
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo-upme:27017")
@@ -36,35 +39,19 @@ def to_wgs84(geom, src_crs):
         return geom
 
 
-def normalize_shapely_geom(geom):
-    """Recibe una geometría Shapely y trata de garantizar que sea válida.
-    Retorna la geometría corregida o None si no se puede arreglar.
-    """
-    try:
-        if geom.is_valid:
-            return geom
-    except Exception:
-        pass
-    try:
-        from shapely.ops import make_valid
-        g = make_valid(geom)
-        if g.is_valid:
-            return g
-    except Exception:
-        try:
-            g = geom.buffer(0)
-            if g.is_valid:
-                return g
-        except Exception:
-            return None
-    try:
-        # como último recurso intentar buffer(0)
-        g = geom.buffer(0)
-        if g.is_valid:
-            return g
-    except Exception:
-        return None
-    return None
+def insertar_lote(coll, docs, geoms):
+    """Normaliza las geometrías del lote en una sola pasada e inserta los
+    documentos; los municipios con geometría no reparable se omiten."""
+    ops = []
+    for doc, geom in zip(docs, normalizar_geometrias(geoms, orientar=False)):
+        if geom is None:
+            print(f"  ⚠ Geometría inválida no reparable para municipio {doc['cod_completo']}; se omite.")
+            continue
+        doc['geometry'] = mapping(geom)
+        ops.append(InsertOne(doc))
+    if ops:
+        coll.bulk_write(ops, ordered=False)
+    return len(ops)
 
 def find_shapefile(tmpdir, target):
     """Busca el shapefile específico en el directorio extraído"""
@@ -117,6 +104,7 @@ def validate_mgn_fields(properties):
     return mapping
 
 def main():
+    perfilar('cargar_municipios')
     print("=" * 60)
     print("CARGA DE MUNICIPIOS MGN (DANE) A MONGODB")
     print("=" * 60)
@@ -146,7 +134,8 @@ def main():
         
         print(f"Shapefile encontrado: {shp}")
         
-        ops = []
+        docs = []
+        geoms = []
         total = 0
         
         with fiona.open(shp, 'r') as src:
@@ -195,23 +184,17 @@ def main():
                     "source": "MGN_DANE_2024"
                 }
 
-                # intentar normalizar la geometría
-                normalized_geom = normalize_shapely_geom(geom)
-                if normalized_geom is None:
-                    print(f"  ⚠ Geometría inválida no reparable para municipio {cod_completo}; se omite.")
-                    continue
-                doc['geometry'] = mapping(normalized_geom)
-
-                ops.append(InsertOne(doc))
+                # La geometría se normaliza por lotes en insertar_lote
+                docs.append(doc)
+                geoms.append(geom)
                 
-                if len(ops) >= BATCH:
-                    coll.bulk_write(ops, ordered=False)
-                    total += len(ops)
-                    ops = []
+                if len(docs) >= BATCH:
+                    total += insertar_lote(coll, docs, geoms)
+                    docs = []
+                    geoms = []
             
-            if ops:
-                coll.bulk_write(ops, ordered=False)
-                total += len(ops)
+            if docs:
+                total += insertar_lote(coll, docs, geoms)
     
     # Crear índices
     print("Creando índices...")
@@ -3,10 +3,14 @@ import json
 from datetime import datetime
 from collections import Counter
 
+from footprints.perfilador import perfilar
+
 # Configuración
 MONGO_URI = 'mongodb://mongo-upme:27017/'
 DB_NAME = 'proyecto_upme'
 
+perfilar('eda_footprints')
+
 print("="*70)
 print("ANÁLISIS EXPLORATORIO DE DATOS (EDA)")
 print("Building Footprints: Google vs Microsoft")
@@ -0,0 +1,5 @@
+"""
+Módulos compartidos por los cargadores de building footprints
+(`cargar_google_footprints.py`, `cargar_microsoft_footprints.py`) y los
+scripts auxiliares de `scripts/`.
+"""
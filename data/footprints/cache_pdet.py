@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Artefacto en disco con el índice PDET listo para usar.
+
+En vez de traer las geometrías de `mgn_municipios_pdet` en cada arranque,
+pasarlas por `shape()` y reconstruir grilla e índice, los cargadores abren
+un directorio versionado con:
+
+  meta.json        versión, clave, firma de la colección, parámetros de la
+                   grilla, códigos y nombres de los municipios;
+  celdas.npy       tabla de la grilla (int32), abierta con mmap;
+  wkb.bin          WKB de los municipios concatenados, abierto con mmap;
+  wkb_offsets.npy  offsets de cada WKB dentro de wkb.bin.
+
+El directorio se llama como los primeros 16 caracteres de la clave, un hash
+de la versión del formato, el tamaño de celda y la firma de la colección
+fuente. La firma la calcula el servidor con `dbHash`, sin transferir las
+geometrías. Si cambian los municipios cambia la clave y el artefacto se
+reconstruye una sola vez. El STRtree no se serializa: sobre 170 geometrías
+se arma en milisegundos.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+from datetime import datetime
+
+import bson
+import numpy as np
+import shapely
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from footprints.grilla_pdet import GrillaMunicipios
+from footprints.indice_pdet import IndiceMunicipios, cargar_municipios_shapes
+
+VERSION_ARTEFACTO = 1
+
+
+def firma_coleccion(collection):
+    """Firma del contenido de la colección fuente.
+
+    Usa el md5 que calcula el servidor con `dbHash`. Si el servidor no lo
+    soporta (p. ej. por permisos), hashea el BSON crudo de los documentos
+    en orden de `_id`, sin decodificarlos.
+    """
+    try:
+        respuesta = collection.database.command('dbHash', collections=[collection.name])
+        return 'dbHash:' + respuesta['collections'][collection.name]
+    except Exception:
+        pass
+    h = hashlib.sha256()
+    try:
+        crudos = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+    except Exception:
+        crudos = collection
+    for doc in crudos.find({}, sort=[('_id', 1)]):
+        h.update(doc.raw if isinstance(doc, RawBSONDocument) else bson.encode(doc))
+    return 'bson:' + h.hexdigest()
+
+
+def clave_artefacto(firma, tamano):
+    datos = json.dumps({'version': VERSION_ARTEFACTO, 'firma': firma, 'tamano': float(tamano)},
+                       sort_keys=True)
+    return hashlib.sha256(datos.encode('utf-8')).hexdigest()
+
+
+def guardar_artefacto(grilla, directorio, clave, firma, coleccion):
+    """Escribe el artefacto de `grilla` en `directorio/<clave[:16]>` y
+    devuelve esa ruta. Se escribe en un directorio temporal y se renombra,
+    así un lector nunca ve un artefacto a medias."""
+    destino = os.path.join(directorio, clave[:16])
+    tmp = f'{destino}.tmp-{os.getpid()}'
+    os.makedirs(tmp, exist_ok=True)
+
+    wkbs = shapely.to_wkb(grilla.indice_pdet.geoms)
+    offsets = np.zeros(len(wkbs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(w) for w in wkbs])
+    with open(os.path.join(tmp, 'wkb.bin'), 'wb') as f:
+        for w in wkbs:
+            f.write(w)
+    np.save(os.path.join(tmp, 'wkb_offsets.npy'), offsets)
+    np.save(os.path.join(tmp, 'celdas.npy'), np.ascontiguousarray(grilla.celdas, dtype=np.int32))
+    meta = {
+        'version': VERSION_ARTEFACTO,
+        'clave': clave,
+        'firma': firma,
+        'coleccion': coleccion,
+        'origen_x': grilla.origen_x,
+        'origen_y': grilla.origen_y,
+        'tamano': grilla.tamano,
+        'codigos': list(grilla.indice_pdet.codigos),
+        'nombres': list(grilla.indice_pdet.nombres),
+        'creado': datetime.utcnow().isoformat(),
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    try:
+        os.rename(tmp, destino)
+    except OSError:
+        # Otro proceso lo publicó primero con la misma clave
+        shutil.rmtree(tmp, ignore_errors=True)
+    return destino
+
+
+def cargar_artefacto(ruta, clave=None):
+    """Abre un artefacto; devuelve la GrillaMunicipios (con su índice) o None
+    si no existe, es de otra versión o no corresponde a `clave`."""
+    try:
+        with open(os.path.join(ruta, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != VERSION_ARTEFACTO or (clave and meta.get('clave') != clave):
+            return None
+        celdas = np.load(os.path.join(ruta, 'celdas.npy'), mmap_mode='r')
+        offsets = np.load(os.path.join(ruta, 'wkb_offsets.npy'), mmap_mode='r')
+        blob = np.memmap(os.path.join(ruta, 'wkb.bin'), dtype=np.uint8, mode='r')
+        wkbs = [blob[a:b].tobytes() for a, b in zip(offsets[:-1], offsets[1:])]
+    except Exception:
+        return None
+    indice = IndiceMunicipios.desde_wkb(meta['codigos'], meta['nombres'], wkbs)
+    grilla = GrillaMunicipios(celdas, meta['origen_x'], meta['origen_y'], meta['tamano'],
+                              indice, clave=meta['clave'])
+    grilla.ruta_artefacto = ruta
+    return grilla
+
+
+def abrir_ultimo_artefacto(directorio):
+    """Abre el artefacto más reciente de `directorio` sin consultar MongoDB
+    (para herramientas que no necesitan verificar la colección fuente)."""
+    candidatos = []
+    for nombre in os.listdir(directorio) if os.path.isdir(directorio) else []:
+        try:
+            with open(os.path.join(directorio, nombre, 'meta.json'), 'r', encoding='utf-8') as f:
+                candidatos.append((json.load(f).get('creado', ''), os.path.join(directorio, nombre)))
+        except Exception:
+            continue
+    for _, ruta in sorted(candidatos, reverse=True):
+        grilla = cargar_artefacto(ruta)
+        if grilla is not None:
+            return grilla
+    return None
+
+
+def _limpiar_anteriores(directorio, vigente):
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        if ruta != vigente and os.path.isdir(ruta) and '.tmp-' not in nombre:
+            shutil.rmtree(ruta, ignore_errors=True)
+
+
+def obtener_indice_pdet(pdet_collection, directorio, tamano=0.01):
+    """Abre el artefacto vigente o lo construye desde la colección.
+
+    Devuelve (grilla, construido, segundos); grilla es None si la colección
+    no tiene municipios. `grilla.indice_pdet` es el índice STRtree.
+    """
+    inicio = time.perf_counter()
+    firma = firma_coleccion(pdet_collection)
+    clave = clave_artefacto(firma, tamano)
+    ruta = os.path.join(directorio, clave[:16])
+
+    grilla = cargar_artefacto(ruta, clave)
+    if grilla is not None:
+        return grilla, False, time.perf_counter() - inicio
+
+    municipios_shapes = cargar_municipios_shapes(pdet_collection)
+    if not municipios_shapes:
+        return None, False, time.perf_counter() - inicio
+    grilla = GrillaMunicipios.construir(IndiceMunicipios(municipios_shapes), tamano)
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        ruta = guardar_artefacto(grilla, directorio, clave, firma, pdet_collection.name)
+        _limpiar_anteriores(directorio, ruta)
+        # Se vuelve a abrir desde disco para que los workers y este proceso
+        # compartan el mismo artefacto mapeado en memoria
+        grilla = cargar_artefacto(ruta, clave) or grilla
+    except Exception as e:
+        print(f"  ⚠ No se pudo guardar el índice PDET en {directorio}: {e}")
+    return grilla, True, time.perf_counter() - inicio
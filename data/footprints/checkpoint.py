@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Checkpoints de las cargas de footprints (`--resume`).
+
+Después de cada lote procesado el cargador registra el estado: posición en
+la entrada (offset en bytes o filas leídas) y contadores. Ese estado solo se
+escribe en disco cuando todos los documentos emitidos hasta ese lote ya
+quedaron insertados (o en el dead-letter), de modo que al reanudar no falta
+nada.
+
+Antes de entregar al escritor los documentos de un lote, el cargador anota
+en el mismo archivo la posición de ese lote (`enviado_hasta`). Al reanudar,
+solo lo que está entre `posicion` y `enviado_hasta` puede haber quedado
+escrito sin confirmarse. Como `building_id` y `geom_hash` son deterministas,
+esos lotes se escriben con upserts por `geom_hash` sin duplicarse, y el resto
+con inserts normales. Un checkpoint sin `enviado_hasta` (anterior a este
+campo) no dice hasta dónde llegó el envío: se reanuda con upserts hasta el
+final y se guarda `enviado_hasta: null` para que una nueva caída no pierda
+esa ventana.
+"""
+import os
+import json
+import threading
+from collections import deque
+from datetime import datetime
+
+# `enviado_hasta` desconocido: todo lo que sigue al checkpoint puede estar escrito
+SIN_LIMITE = float('inf')
+
+
+def firma_entrada(paths):
+    """Rutas y tamaños de la entrada, para verificar que el checkpoint
+    corresponde a los mismos archivos."""
+    return [[str(p), os.path.getsize(p)] for p in paths]
+
+
+def enviado_hasta(estado):
+    """Posición hasta la que se entregaron documentos al escritor según el
+    checkpoint; SIN_LIMITE si no se sabe (falta el campo o es null)."""
+    hasta = estado.get('enviado_hasta')
+    return SIN_LIMITE if hasta is None else hasta
+
+
+def leer_checkpoint(path):
+    """Devuelve el último estado guardado o None si no hay checkpoint."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠ No se pudo leer el checkpoint {path}: {e}")
+        return None
+
+
+class Checkpoint:
+    """Escribe el estado más reciente cuyos documentos ya están en MongoDB."""
+
+    def __init__(self, path, estado=None):
+        self.path = path
+        self._pendientes = deque()  # (docs_emitidos, estado) en orden
+        self._escritos = 0          # documentos confirmados por el escritor
+        # Último estado guardado (el del checkpoint al reanudar) y posición
+        # hasta la que se entregaron documentos al escritor
+        self._estado = estado
+        self._enviado_hasta = enviado_hasta(estado) if estado else None
+        self._lock = threading.Lock()
+        self.guardados = 0
+        if estado and 'enviado_hasta' not in estado:
+            # Checkpoint anterior a `enviado_hasta`: se deja escrito que no
+            # hay límite antes de enviar nada
+            self._escribir(estado)
+
+    def registrar(self, docs_emitidos, estado):
+        """Registra el estado tras un lote; `docs_emitidos` son los documentos
+        entregados al escritor en esta ejecución hasta ese lote inclusive."""
+        with self._lock:
+            self._pendientes.append((docs_emitidos, estado))
+            self._guardar_confirmados()
+
+    def anunciar(self, posicion):
+        """Llamado antes de entregar al escritor documentos de la entrada
+        hasta `posicion`: se guarda primero, para que al reanudar se sepa
+        hasta dónde puede haber documentos escritos sin confirmar."""
+        with self._lock:
+            if self._enviado_hasta is not None and posicion <= self._enviado_hasta:
+                return
+            self._enviado_hasta = posicion
+            if self._estado is not None:
+                self._escribir(self._estado)
+
+    def confirmar(self, docs_escritos):
+        """Llamado por el escritor cuando los primeros `docs_escritos`
+        documentos (contiguos) ya se insertaron."""
+        with self._lock:
+            self._escritos = max(self._escritos, docs_escritos)
+            self._guardar_confirmados()
+
+    def _guardar_confirmados(self):
+        ultimo = None
+        while self._pendientes and self._pendientes[0][0] <= self._escritos:
+            ultimo = self._pendientes.popleft()[1]
+        if ultimo is None:
+            return
+        self._estado = ultimo
+        self._escribir(ultimo)
+
+    def _escribir(self, estado):
+        # Una ejecución reanudada no baja el enviado_hasta de la anterior
+        hasta = max(estado['posicion'], self._enviado_hasta or 0)
+        ultimo = dict(estado, enviado_hasta=None if hasta == SIN_LIMITE else hasta,
+                      actualizado=datetime.utcnow().isoformat())
+        directorio = os.path.dirname(self.path)
+        try:
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(ultimo, f)
+            os.replace(tmp, self.path)
+            self.guardados += 1
+        except Exception as e:
+            print(f"⚠ No se pudo guardar el checkpoint {self.path}: {e}")
+
+    def borrar(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def lotes_con_posicion(lotes, posiciones, posicion=None, inicio=0):
+    """Entrega los lotes y anota en `posiciones` la posición de la entrada
+    después de cada uno: `posicion()` si se da (p. ej. el offset del
+    escáner) o la cantidad de elementos leídos contando desde `inicio`."""
+    leidos = inicio
+    for lote in lotes:
+        leidos += len(lote)
+        posiciones.append(posicion() if posicion else leidos)
+        yield lote
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lotes de footprints en forma columnar.
+
+Las geometrías de un lote se guardan como buffers planos: coordenadas
+float64 más los offsets de anillos, polígonos y partes (el formato de
+`shapely.to_ragged_array`). Los demás campos van en arreglos paralelos. La
+entrada GeoJSON se vuelca a esos buffers y se construye con
+`shapely.from_ragged_array` en vez de un `shape()` por Feature. A la salida,
+los dict GeoJSON se arman recién al codificar cada documento a BSON.
+
+Con `--workers`, la codificación ocurre en el worker: al proceso principal
+solo llegan bytes, que se entregan a `insert_many` como `RawBSONDocument`
+sin volver a codificar.
+"""
+from datetime import datetime
+
+import bson
+import numpy as np
+import shapely
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from shapely.geometry import shape, mapping
+
+from footprints.metricas import METRICAS
+
+_POLIGONO = shapely.GeometryType.POLYGON
+_MULTIPOLIGONO = shapely.GeometryType.MULTIPOLYGON
+
+
+def _desde_ragged(tipo, coordenadas):
+    """Construye con from_ragged_array las geometrías de un solo tipo a
+    partir de sus coordenadas GeoJSON anidadas."""
+    planas = []
+    largos_anillos = []
+    largos_poligonos = []
+    largos_partes = []
+    for coords in coordenadas:
+        poligonos = coords if tipo == _MULTIPOLIGONO else (coords,)
+        largos_partes.append(len(poligonos))
+        for anillos in poligonos:
+            largos_poligonos.append(len(anillos))
+            for anillo in anillos:
+                largos_anillos.append(len(anillo))
+                planas.extend(anillo)
+    xy = np.asarray(planas, dtype=np.float64).reshape(len(planas), -1)
+    offsets = [np.concatenate(([0], np.cumsum(largos, dtype=np.int64)))
+               for largos in (largos_anillos, largos_poligonos, largos_partes)]
+    if tipo == _POLIGONO:
+        offsets = offsets[:2]
+    return shapely.from_ragged_array(tipo, xy, tuple(offsets))
+
+
+def geometrias_desde_geojson(geometrias):
+    """Arreglo de geometrías Shapely a partir de geometrías GeoJSON (dict).
+
+    Polygon y MultiPolygon se construyen por tipo desde buffers planos; los
+    demás tipos, y cualquier grupo cuyas coordenadas no se puedan volcar a
+    un buffer (anillos cortos, dimensiones mezcladas), pasan por `shape()`.
+    Lo que no se puede construir queda en None.
+    """
+    salida = np.full(len(geometrias), None, dtype=object)
+    grupos = {_POLIGONO: [], _MULTIPOLIGONO: []}
+    sueltas = []
+    for i, geom in enumerate(geometrias):
+        tipo = geom.get('type') if isinstance(geom, dict) else None
+        if tipo == 'Polygon':
+            grupos[_POLIGONO].append(i)
+        elif tipo == 'MultiPolygon':
+            grupos[_MULTIPOLIGONO].append(i)
+        else:
+            sueltas.append(i)
+
+    for tipo, indices in grupos.items():
+        if not indices:
+            continue
+        try:
+            salida[indices] = _desde_ragged(tipo, [geometrias[i]['coordinates'] for i in indices])
+        except Exception:
+            sueltas.extend(indices)
+
+    for i in sueltas:
+        try:
+            salida[i] = shape(geometrias[i])
+        except Exception:
+            pass
+    return salida
+
+
+class LoteColumnar:
+    """Documentos de un lote (ya filtrados por PDET) en forma columnar.
+
+    `geometrias` es el arreglo de geometrías normalizadas; de él solo se
+    guardan los buffers de `to_ragged_array` (los Polygon y MultiPolygon
+    van juntos en el formato de MultiPolygon). Las geometrías de otro tipo,
+    que `make_valid` produce en casos raros, se guardan ya como GeoJSON en
+    `otras`.
+    """
+
+    def __init__(self, fuente, geometrias=(), codigos=(), propiedades=(), building_ids=(),
+                 hashes=(), centroides_x=(), centroides_y=(), areas=(), perimetros=()):
+        self.fuente = fuente
+        self.codigos = list(codigos)
+        self.propiedades = list(propiedades)
+        self.building_ids = list(building_ids)
+        self.hashes = list(hashes)
+        self.centroides = np.column_stack([np.asarray(centroides_x, dtype=np.float64),
+                                           np.asarray(centroides_y, dtype=np.float64)])
+        self.areas = np.asarray(areas, dtype=np.float64)
+        self.perimetros = np.asarray(perimetros, dtype=np.float64)
+
+        geometrias = np.asarray(geometrias, dtype=object)
+        self.tipos = shapely.get_type_id(geometrias).astype(np.int8)
+        poligonales = (self.tipos == _POLIGONO) | (self.tipos == _MULTIPOLIGONO)
+        # Posición de cada documento poligonal dentro de los buffers
+        self.posiciones = np.cumsum(poligonales) - 1
+        self.otras = {int(i): mapping(geometrias[i]) for i in np.flatnonzero(~poligonales)}
+
+        self.coords = np.empty((0, 2))
+        self.anillos = self.poligonos = self.partes = np.zeros(1, dtype=np.int64)
+        if poligonales.any():
+            tipo, self.coords, offsets = shapely.to_ragged_array(geometrias[poligonales])
+            if tipo == _POLIGONO:
+                self.anillos, self.poligonos = offsets
+                self.partes = np.arange(len(self.poligonos), dtype=np.int64)
+            else:
+                self.anillos, self.poligonos, self.partes = offsets
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def _geometrias_geojson(self):
+        """Dict GeoJSON de cada documento, armados desde los buffers."""
+        coords = self.coords.tolist()
+        anillos = self.anillos.tolist()
+        poligonos = self.poligonos.tolist()
+        partes = self.partes.tolist()
+        for i, (tipo, j) in enumerate(zip(self.tipos.tolist(), self.posiciones.tolist())):
+            if i in self.otras:
+                yield self.otras[i]
+                continue
+            rings = [[coords[anillos[r]:anillos[r + 1]] for r in range(poligonos[p], poligonos[p + 1])]
+                     for p in range(partes[j], partes[j + 1])]
+            if tipo == _POLIGONO:
+                yield {'type': 'Polygon', 'coordinates': rings[0]}
+            else:
+                yield {'type': 'MultiPolygon', 'coordinates': rings}
+
+    def documentos(self, extra=None):
+        """Genera los documentos (dict) del lote; `extra` se agrega a cada uno."""
+        loaded_at = datetime.utcnow()
+        centroides = self.centroides.tolist()
+        areas = self.areas.tolist()
+        perimetros = self.perimetros.tolist()
+        for i, geometry in enumerate(self._geometrias_geojson()):
+            documento = {
+                '_id': ObjectId(),
+                'building_id': self.building_ids[i],
+                'fuente': self.fuente,
+                'codigo_municipio': self.codigos[i],
+                'geometry': geometry,
+                'centroid': {'type': 'Point', 'coordinates': centroides[i]},
+                'area_m2': areas[i],
+                'perimeter_m': perimetros[i],
+                'loaded_at': loaded_at,
+            }
+            if self.propiedades[i]:
+                documento['properties'] = self.propiedades[i]
+            documento['geom_hash'] = self.hashes[i]
+            if extra:
+                documento.update(extra)
+            yield documento
+
+    def codificar(self, extra=None):
+        """Lista de documentos codificados en BSON (bytes), en orden.
+
+        El `_id` se asigna aquí para que un reintento tras un error de red
+        choque con E11000 (y se reconozca por su `_id`) en vez de duplicarse.
+        """
+        with METRICAS.etapa('codificacion_bson', len(self)):
+            return [bson.encode(d) for d in self.documentos(extra)]
+
+
+def documentos_bson(crudos):
+    """Envuelve los bytes de `LoteColumnar.codificar` como RawBSONDocument."""
+    return [RawBSONDocument(c) for c in crudos]
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Escritura a MongoDB en segundo plano.
+
+El cargador arma los batches y los deja en una cola acotada; uno o más
+hilos escritores los insertan con `insert_many(ordered=False)`. Así el
+parseo y el filtrado siguen avanzando mientras el servidor escribe, y la
+cola llena frena al productor (backpressure) para que la memoria no crezca
+sin límite.
+
+El tamaño de cada batch lo decide `ControladorBatch`: mide el tamaño BSON de
+cada documento y la latencia observada de cada `insert_many`, y ajusta la
+cantidad de documentos para acercarse a una latencia objetivo sin pasar un
+tope de bytes por batch (los polígonos de Microsoft varían mucho en
+cantidad de vértices).
+
+Si un `insert_many` falla parcialmente, los documentos escritos se
+conservan y solo los fallidos se reintentan con espera exponencial. Los que
+fallan por un error permanente (clave duplicada, geometría que el índice
+2dsphere rechaza, etc.) o agotan los reintentos se escriben en un archivo
+dead-letter JSONL para revisarlos sin repetir la carga completa.
+
+En modo incremental (`upsert_por='geom_hash'`) se buscan primero, por batch,
+las huellas que ya están en la colección. Las que tienen el mismo contenido
+no se escriben; el resto va con un `UpdateOne(..., upsert=True)` sobre esa
+clave, que inserta las nuevas y actualiza los campos de las que cambiaron.
+Para `--prune` (`marcar_sin_cambios=True`) las que no cambiaron reciben el
+`carga_id` de la carga en un único `update_many` por batch. `enviar(..., upsert_por=...)` pide lo mismo
+para un batch suelto: al reanudar una carga completa solo los lotes que la
+ejecución anterior pudo dejar escritos sin confirmar se escriben así.
+
+Si un hilo escritor falla por un error no previsto (codificación, driver,
+...), su batch va al dead-letter, el hilo termina y `enviar()`/`cerrar()`
+lanzan `ErrorEscritor`: la carga se detiene en vez de quedar bloqueada con la
+cola llena.
+
+Los documentos pueden llegar como dict o ya codificados (`RawBSONDocument`,
+ver `footprints.columnar`); estos últimos se miden por sus bytes y se
+insertan sin volver a codificar.
+"""
+import os
+import time
+import queue
+import threading
+
+import bson
+from bson import json_util
+from bson.raw_bson import RawBSONDocument
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from footprints.metricas import METRICAS
+
+_FIN = object()
+
+# Errores de escritura que no se resuelven reintentando
+ERRORES_PERMANENTES = {
+    2,      # BadValue
+    121,    # DocumentValidationFailure
+    10334,  # BSONObjectTooLarge
+    11000,  # DuplicateKey
+    16755,  # Can't extract geo keys
+}
+
+
+class ErrorEscritor(RuntimeError):
+    """Un hilo escritor terminó por un error inesperado."""
+
+
+def _a_bson(documento):
+    if isinstance(documento, RawBSONDocument):
+        return documento.raw
+    return bson.encode(documento)
+
+
+def _a_dict(documento):
+    if isinstance(documento, RawBSONDocument):
+        return bson.decode(documento.raw)
+    return documento
+
+
+class ControladorBatch:
+    """Arma batches por cantidad y bytes y adapta la cantidad a la latencia.
+
+    Después de cada insert el tamaño pasa a los documentos que se escribirían
+    en `objetivo_seg` a la velocidad observada (como mucho la mitad o el doble
+    del tamaño anterior por paso) y queda entre `minimo` y
+    `maximo`. Con minimo == maximo el tamaño es fijo y solo aplica el tope
+    de bytes.
+    """
+
+    def __init__(self, inicial=5000, minimo=500, maximo=50000,
+                 max_bytes=16 * 1024 * 1024, objetivo_seg=0.5):
+        self.minimo = max(1, min(minimo, inicial))
+        self.maximo = max(maximo, inicial)
+        self.tamano = inicial
+        self.max_bytes = max_bytes
+        self.objetivo_seg = objetivo_seg
+        self._batch = []
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Estadísticas de los batches escritos
+        self.batches = 0
+        self.docs = 0
+        self.bytes = 0
+        self.segundos = 0.0
+        self.min_docs = None
+        self.max_docs = 0
+        self.max_batch_bytes = 0
+
+    def agregar(self, documento):
+        """Agrega un documento; devuelve (batch, bytes) cuando hay que
+        enviarlo o None."""
+        self._batch.append(documento)
+        self._bytes += len(_a_bson(documento))
+        if len(self._batch) >= self.tamano or self._bytes >= self.max_bytes:
+            return self.vaciar()
+        return None
+
+    def vaciar(self):
+        """Devuelve el batch en curso (posiblemente vacío) y lo reinicia."""
+        salida = (self._batch, self._bytes)
+        self._batch = []
+        self._bytes = 0
+        return salida
+
+    def registrar(self, n_docs, n_bytes, segundos):
+        """Registra un insert terminado y recalcula el tamaño de batch."""
+        with self._lock:
+            self.batches += 1
+            self.docs += n_docs
+            self.bytes += n_bytes
+            self.segundos += segundos
+            self.min_docs = n_docs if self.min_docs is None else min(self.min_docs, n_docs)
+            self.max_docs = max(self.max_docs, n_docs)
+            self.max_batch_bytes = max(self.max_batch_bytes, n_bytes)
+            if not n_docs or segundos <= 0:
+                return
+            # Documentos que caben en la latencia objetivo a la velocidad observada
+            propuesto = self.objetivo_seg * n_docs / segundos
+            propuesto = min(2 * self.tamano, max(self.tamano / 2, propuesto))
+            self.tamano = int(min(self.maximo, max(self.minimo, propuesto)))
+
+    def resumen(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'tamano_actual': self.tamano,
+                'min_docs': self.min_docs or 0,
+                'max_docs': self.max_docs,
+                'prom_docs': self.docs / self.batches if self.batches else 0,
+                'prom_mb': self.bytes / self.batches / 1024 ** 2 if self.batches else 0,
+                'max_mb': self.max_batch_bytes / 1024 ** 2,
+                'latencia_ms': 1000 * self.segundos / self.batches if self.batches else 0,
+            }
+
+
+class EscritorMongo:
+    """Pool de hilos que drena batches de documentos hacia una colección."""
+
+    def __init__(self, collection, hilos=1, profundidad=4, controlador=None,
+                 reintentos=3, espera_seg=1.0, dead_letter=None, checkpoint=None,
+                 upsert_por=None, solo_al_insertar=('building_id', 'loaded_at'),
+                 marcar_sin_cambios=False):
+        self.collection = collection
+        self.upsert_por = upsert_por
+        self.marcar_sin_cambios = marcar_sin_cambios
+        self.solo_al_insertar = solo_al_insertar
+        self.checkpoint = checkpoint
+        self.controlador = controlador
+        self.reintentos = reintentos
+        self.espera_seg = espera_seg
+        self.dead_letter = dead_letter
+        self.cola = queue.Queue(maxsize=max(1, profundidad))
+        self.insertados = 0
+        self.actualizados = 0
+        self.sin_cambios = 0
+        self.errores = 0
+        self.reintentados = 0
+        # Primer error inesperado de un hilo escritor
+        self.fallo = None
+        self._lock = threading.Lock()
+        self._lock_dead_letter = threading.Lock()
+        # Secuencia de batches para saber hasta qué documento (contiguo) se
+        # terminó de escribir, aunque varios hilos terminen en desorden
+        self._enviados = 0
+        self._siguiente_seq = 0
+        self._seq_confirmada = 0
+        self._terminados = {}
+        self._hilos = [threading.Thread(target=self._trabajar, name=f'escritor-{i}', daemon=True)
+                       for i in range(max(1, hilos))]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def enviar(self, batch, n_bytes=0, upsert_por=None):
+        """Encola un batch; bloquea mientras la cola esté llena. Con
+        `upsert_por` el batch se escribe con upserts por esa clave aunque el
+        escritor inserte."""
+        if batch:
+            self._enviados += len(batch)
+            METRICAS.muestrear_cola('cola_escritura', self.cola.qsize())
+            # Tiempo que el parseo queda frenado por la cola llena
+            with METRICAS.etapa('espera_escritura', len(batch)):
+                self._poner((batch, n_bytes, self._siguiente_seq, self._enviados,
+                             upsert_por or self.upsert_por))
+            self._siguiente_seq += 1
+
+    def _verificar(self):
+        if self.fallo is not None:
+            raise ErrorEscritor(f"un hilo escritor terminó por {type(self.fallo).__name__}: "
+                                f"{self.fallo}") from self.fallo
+
+    def _poner(self, item):
+        # Con timeout, para no quedar bloqueado si los escritores murieron
+        while True:
+            self._verificar()
+            try:
+                self.cola.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def _trabajar(self):
+        while True:
+            item = self.cola.get()
+            if item is _FIN:
+                return
+            try:
+                self._insertar(*item)
+            except Exception as e:
+                batch = item[0]
+                print(f"✗ ERROR inesperado en {threading.current_thread().name}: {type(e).__name__}: {e}")
+                self._a_dead_letter([(d, {'errmsg': f'{type(e).__name__}: {e}'}) for d in batch])
+                with self._lock:
+                    self.errores += len(batch)
+                    if self.fallo is None:
+                        self.fallo = e
+                return
+
+    def _insertar(self, batch, n_bytes=0, seq=None, fin_docs=0, upsert_por=None):
+        inicio = time.perf_counter()
+        with METRICAS.etapa('insercion', len(batch)):
+            insertados, existentes, iguales, fallidos = self._insertar_con_reintentos(batch, upsert_por)
+        if self.controlador is not None:
+            self.controlador.registrar(len(batch), n_bytes, time.perf_counter() - inicio)
+        if fallidos:
+            self._a_dead_letter(fallidos)
+            print(f"✗ ERROR al insertar batch: {len(fallidos)} documentos fallidos "
+                  f"({fallidos[0][1].get('errmsg', '')})")
+        with self._lock:
+            self.insertados += insertados
+            self.actualizados += existentes
+            self.sin_cambios += iguales
+            self.errores += len(fallidos)
+            total = self.insertados
+        if insertados and not upsert_por:
+            print(f"  ✓ Insertados: {total:,}")
+        elif insertados or existentes or iguales:
+            print(f"  ✓ Nuevos: {total:,} | Actualizados: {self.actualizados:,} | "
+                  f"Sin cambios: {self.sin_cambios:,}")
+        if seq is not None:
+            self._terminar(seq, fin_docs)
+
+    def _terminar(self, seq, fin_docs):
+        with self._lock:
+            self._terminados[seq] = fin_docs
+            escritos = None
+            while self._seq_confirmada in self._terminados:
+                escritos = self._terminados.pop(self._seq_confirmada)
+                self._seq_confirmada += 1
+        if escritos is not None and self.checkpoint is not None:
+            self.checkpoint.confirmar(escritos)
+
+    def _escribir(self, documentos, upsert_por=None):
+        """Escribe sin orden; devuelve (nuevos, existentes)."""
+        if not upsert_por:
+            self.collection.insert_many(documentos, ordered=False)
+            return len(documentos), 0
+        operaciones = []
+        for d in map(_a_dict, documentos):
+            al_insertar = {k: d[k] for k in self.solo_al_insertar if k in d}
+            resto = {k: v for k, v in d.items() if k not in al_insertar and k != '_id'}
+            operaciones.append(UpdateOne({upsert_por: d[upsert_por]},
+                                         {'$set': resto, '$setOnInsert': al_insertar}, upsert=True))
+        r = self.collection.bulk_write(operaciones, ordered=False)
+        return r.upserted_count, r.matched_count
+
+    def _descartar_sin_cambios(self, documentos, upsert_por):
+        """Quita los documentos que ya están en la colección con el mismo
+        contenido; devuelve (a escribir, cantidad sin cambios)."""
+        documentos = [_a_dict(d) for d in documentos]
+        ignorar = {'_id', 'carga_id', *self.solo_al_insertar}
+        existentes = {
+            e[upsert_por]: e for e in self.collection.find(
+                {upsert_por: {'$in': [d[upsert_por] for d in documentos]}}, {k: 0 for k in ignorar})
+        }
+        escribir = []
+        iguales = []
+        for d in documentos:
+            previo = existentes.get(d[upsert_por])
+            if previo is not None and all(previo.get(k) == v for k, v in d.items() if k not in ignorar):
+                iguales.append(d)
+            else:
+                escribir.append(d)
+        if iguales and self.marcar_sin_cambios:
+            # Siguen en la entrada: --prune no las debe borrar
+            self.collection.update_many({upsert_por: {'$in': [d[upsert_por] for d in iguales]}},
+                                        {'$set': {'carga_id': iguales[0]['carga_id']}})
+        return escribir, len(iguales)
+
+    def _separar_ya_escritos(self, duplicados):
+        """De los E11000 de un reintento, cuenta los documentos que ya están
+        en la colección con el mismo `_id` y `geom_hash` (los escribió el
+        intento anterior); devuelve (cantidad ya escrita, [(documento, error)]
+        que chocan con otro documento)."""
+        ids = [d.get('_id') for d, _ in duplicados]
+        try:
+            guardados = {e['_id']: e.get('geom_hash') for e in self.collection.find(
+                {'_id': {'$in': ids}}, {'geom_hash': 1})}
+        except PyMongoError:
+            # Sin poder comprobarlo no se da por escrito
+            return 0, duplicados
+        otros = [(d, error) for (d, error), _id in zip(duplicados, ids)
+                 if _id not in guardados or guardados[_id] != d.get('geom_hash')]
+        return len(duplicados) - len(otros), otros
+
+    def _insertar_con_reintentos(self, batch, upsert_por=None):
+        """Devuelve (nuevos, existentes, sin cambios, [(documento, error), ...]
+        sin escribir)."""
+        pendientes = batch
+        insertados = 0
+        existentes = 0
+        sin_cambios = 0
+        fallidos = []
+        intento = 0
+        while pendientes:
+            reintentar = []
+            duplicados = []
+            try:
+                if upsert_por:
+                    pendientes, iguales = self._descartar_sin_cambios(pendientes, upsert_por)
+                    sin_cambios += iguales
+                    if not pendientes:
+                        break
+                nuevos, previos = self._escribir(pendientes, upsert_por)
+                insertados += nuevos
+                existentes += previos
+            except BulkWriteError as e:
+                insertados += e.details.get('nInserted', 0) + e.details.get('nUpserted', 0)
+                existentes += e.details.get('nMatched', 0)
+                for error in e.details.get('writeErrors', []):
+                    documento = pendientes[error['index']]
+                    if intento and not upsert_por and error.get('code') == 11000:
+                        # Puede ser este mismo documento escrito en el intento
+                        # anterior (el E11000 sale en `_id`, `geom_hash` o
+                        # `building_id`, según el índice que se revise primero)
+                        duplicados.append((documento, error))
+                    elif upsert_por and error.get('code') == 11000:
+                        # Dos upserts concurrentes de la misma clave: al
+                        # reintentar el segundo encuentra el documento
+                        reintentar.append((documento, error))
+                    elif error.get('code') in ERRORES_PERMANENTES:
+                        fallidos.append((documento, error))
+                    else:
+                        reintentar.append((documento, error))
+            except PyMongoError as e:
+                # Red, timeout o elección de primario: no se sabe qué quedó
+                # escrito, se reintenta todo (los ya escritos darán E11000)
+                reintentar = [(d, {'errmsg': str(e)}) for d in pendientes]
+            if duplicados:
+                escritos, otros = self._separar_ya_escritos(duplicados)
+                insertados += escritos
+                fallidos.extend(otros)
+
+            if not reintentar:
+                break
+            if intento >= self.reintentos:
+                fallidos.extend(reintentar)
+                break
+            intento += 1
+            with self._lock:
+                self.reintentados += len(reintentar)
+            espera = self.espera_seg * 2 ** (intento - 1)
+            print(f"  ⚠ Reintentando {len(reintentar)} documentos en {espera:g} s "
+                  f"(intento {intento}/{self.reintentos}): {reintentar[0][1].get('errmsg', '')}")
+            time.sleep(espera)
+            pendientes = [d for d, _ in reintentar]
+        return insertados, existentes, sin_cambios, fallidos
+
+    def _a_dead_letter(self, fallidos):
+        if not self.dead_letter:
+            return
+        with self._lock_dead_letter:
+            try:
+                directorio = os.path.dirname(self.dead_letter)
+                if directorio:
+                    os.makedirs(directorio, exist_ok=True)
+                with open(self.dead_letter, 'a', encoding='utf-8') as f:
+                    for documento, error in fallidos:
+                        f.write(json_util.dumps({
+                            'error': {'code': error.get('code'), 'errmsg': error.get('errmsg')},
+                            'documento': documento,
+                        }) + '\n')
+            except Exception as e:
+                print(f"⚠ No se pudo escribir el dead-letter {self.dead_letter}: {e}")
+
+    def cerrar(self):
+        """Espera a que se escriban todos los batches encolados; lanza
+        ErrorEscritor si algún hilo escritor falló."""
+        for _ in self._hilos:
+            self._poner(_FIN)
+        for hilo in self._hilos:
+            hilo.join()
+        self._verificar()
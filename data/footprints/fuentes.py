@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fuentes de footprints y adaptadores de lectura del motor de carga.
+
+Una `Fuente` (Google, Microsoft) solo define lo que cambia entre cargas:
+nombre, colección destino y variables de entorno. El formato de la entrada
+lo resuelve un adaptador, elegido por la extensión del archivo:
+
+  - CSV.GZ de Google Open Buildings (una o más partes);
+  - GeoPackage (fiona);
+  - GeoJSONL, leído por rangos de bytes con mmap;
+  - GeoJSON FeatureCollection, leído en streaming (el caso por defecto).
+
+Cada adaptador entrega el mismo generador de (documentos, conteos) de
+`footprints.paralelo` y anota en `posiciones` la posición de la entrada al
+terminar cada lote, para los checkpoints. El tiempo de lectura de cada lote
+se mide como la etapa `lectura`. Paralelismo, batches, escritura,
+índices y métricas quedan en `footprints.motor`, comunes a todas las fuentes.
+"""
+import os
+
+from footprints.checkpoint import lotes_con_posicion
+from footprints.geojson_stream import EscanerFeatures
+from footprints.geojsonl import es_geojsonl, rangos_por_lineas
+from footprints.google_csv import es_csv, iter_filas_csv
+from footprints.gpkg import es_gpkg, iter_features_gpkg
+from footprints.metricas import METRICAS
+from footprints.paralelo import procesar_filas, procesar_lotes, procesar_rangos
+from footprints.procesamiento import iter_lotes
+
+
+class Fuente:
+    """Parámetros de una fuente de footprints."""
+
+    def __init__(self, nombre, coleccion, variable_entrada, entrada_default, variable_batch):
+        self.nombre = nombre
+        self.coleccion = coleccion
+        self.variable_entrada = variable_entrada
+        self.entrada_default = entrada_default
+        self.variable_batch = variable_batch
+
+    def entrada(self):
+        return os.getenv(self.variable_entrada, self.entrada_default)
+
+
+FUENTES = {
+    'google': Fuente('Google', 'buildings_google', 'GOOGLE_INPUT_FILE',
+                     'samples/google_buildings.geojson', 'GOOGLE_BATCH_SIZE'),
+    'microsoft': Fuente('Microsoft', 'buildings_microsoft', 'MICROSOFT_INPUT_FILE',
+                        'samples/sample_microsoft.geojsonl', 'MICROSOFT_BATCH_SIZE'),
+}
+
+
+class LectorCSVGoogle:
+    """Partes CSV.GZ de Google: se descartan por lat/lon las filas lejos de
+    PDET y solo el resto pasa por el parseo del WKT."""
+    nombre = 'CSV.GZ'
+    varias_entradas = True
+
+    @staticmethod
+    def acepta(path):
+        return es_csv(path)
+
+    def leer(self, entradas, desde, posiciones, grilla_pdet, fuente, workers, tamano_lote, extra):
+        print(f"Leyendo {len(entradas)} parte(s) CSV en streaming...")
+        lotes = METRICAS.medir_lotes(iter_lotes(iter_filas_csv(entradas, saltar=desde), tamano_lote))
+        lotes = lotes_con_posicion(lotes, posiciones, inicio=desde)
+        return procesar_filas(lotes, grilla_pdet, fuente, workers, extra=extra)
+
+
+class LectorGPKG:
+    """GeoPackage: el proceso principal lee los Features con fiona y los
+    lotes se procesan como los de un FeatureCollection."""
+    nombre = 'GeoPackage'
+    varias_entradas = False
+
+    def __init__(self, capa=None):
+        self.capa = capa
+
+    @staticmethod
+    def acepta(path):
+        return es_gpkg(path)
+
+    def leer(self, entradas, desde, posiciones, grilla_pdet, fuente, workers, tamano_lote, extra):
+        print(f"Leyendo GeoPackage{f' (capa {self.capa})' if self.capa else ''} con fiona...")
+        lotes = METRICAS.medir_lotes(iter_lotes(iter_features_gpkg(entradas[0], self.capa, saltar=desde),
+                                                tamano_lote))
+        lotes = lotes_con_posicion(lotes, posiciones, inicio=desde)
+        return procesar_lotes(lotes, grilla_pdet, fuente, workers, extra=extra)
+
+
+class LectorGeoJSONL:
+    """GeoJSONL: rangos de bytes alineados a líneas que cada worker lee con mmap."""
+    nombre = 'GeoJSONL'
+    varias_entradas = False
+
+    def __init__(self, rango_mb=32):
+        self.rango_mb = rango_mb
+
+    @staticmethod
+    def acepta(path):
+        return es_geojsonl(path)
+
+    def leer(self, entradas, desde, posiciones, grilla_pdet, fuente, workers, tamano_lote, extra):
+        rangos = rangos_por_lineas(entradas[0], self.rango_mb * 1024 * 1024, desde=desde)
+        posiciones.extend(fin for _, fin in rangos)
+        print(f"Leyendo GeoJSONL en {len(rangos)} rangos de ~{self.rango_mb} MB (mmap)...")
+        return procesar_rangos(entradas[0], rangos, grilla_pdet, fuente, workers, tamano_lote, extra=extra)
+
+
+class LectorGeoJSON:
+    """FeatureCollection: los Features se entregan como bytes crudos y se
+    decodifican dentro de cada lote (en los workers cuando se usa --workers)."""
+    nombre = 'GeoJSON'
+    varias_entradas = False
+
+    @staticmethod
+    def acepta(path):
+        return True
+
+    def leer(self, entradas, desde, posiciones, grilla_pdet, fuente, workers, tamano_lote, extra):
+        print("Leyendo GeoJSON en streaming...")
+        escaner = EscanerFeatures(entradas[0], inicio=desde)
+        lotes = METRICAS.medir_lotes(iter_lotes(escaner, tamano_lote))
+        lotes = lotes_con_posicion(lotes, posiciones, posicion=lambda: escaner.posicion)
+        return procesar_lotes(lotes, grilla_pdet, fuente, workers, extra=extra)
+
+
+def elegir_lector(entradas, rango_mb=32, capa_gpkg=None):
+    """Adaptador para las entradas: el primero que acepta todas (el de
+    GeoJSON acepta cualquier archivo)."""
+    lectores = (LectorCSVGoogle(), LectorGPKG(capa_gpkg), LectorGeoJSONL(rango_mb), LectorGeoJSON())
+    for lector in lectores:
+        if all(lector.acepta(p) for p in entradas):
+            return lector
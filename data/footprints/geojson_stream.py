@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura en streaming de un GeoJSON FeatureCollection.
+
+Reemplaza el lector carácter por carácter (`f.read(1)` + `obj_buf += ch`)
+que estaba copiado en los cargadores y en `scripts/extract_features.py`.
+El archivo se lee en bloques grandes de bytes y los límites de cada Feature
+se calculan sobre el bloque completo con NumPy: se ubican las comillas (que
+no estén escapadas) y las llaves fuera de strings, y una suma acumulada de
++1/-1 da la profundidad de cada llave. Un Feature termina donde la
+profundidad vuelve a 0. Ningún byte pasa por código Python uno a uno y la
+memoria queda acotada al bloque de lectura más el Feature en curso.
+"""
+import json
+
+import numpy as np
+
+TAMANO_BLOQUE = 8 * 1024 * 1024
+
+_CLAVE_FEATURES = b'"features"'
+
+
+_COMILLA, _BARRA, _ABRE, _CIERRA, _CORCHETE = 0x22, 0x5C, 0x7B, 0x7D, 0x5D
+
+
+def _comillas_reales(a):
+    """Posiciones de las comillas que abren o cierran strings (no escapadas)."""
+    comillas = np.flatnonzero(a == _COMILLA)
+    sospechosas = comillas[(comillas > 0) & (a[comillas - 1] == _BARRA)]
+    if not len(sospechosas):
+        return comillas
+    # Escapada si la precede un número impar de barras invertidas (raro en
+    # footprints: solo se recorre en Python este subconjunto)
+    escapadas = []
+    for p in sospechosas.tolist():
+        n = 0
+        while p - n - 1 >= 0 and a[p - n - 1] == _BARRA:
+            n += 1
+        if n % 2 == 1:
+            escapadas.append(p)
+    return np.setdiff1d(comillas, escapadas, assume_unique=True)
+
+
+def _limites_features(buf):
+    """Calcula (inicios, fines, fin_arreglo) de los Features completos en buf.
+
+    buf debe empezar fuera de cualquier string y con profundidad 0 (entre
+    Features). fin_arreglo es el índice del ']' que cierra "features" o None.
+    """
+    a = np.frombuffer(buf, dtype=np.uint8)
+    comillas = _comillas_reales(a)
+    llaves = np.flatnonzero((a == _ABRE) | (a == _CIERRA) | (a == _CORCHETE))
+    # Fuera de strings: cantidad par de comillas antes de la llave
+    llaves = llaves[np.searchsorted(comillas, llaves) % 2 == 0]
+    tipos = a[llaves]
+    delta = (tipos == _ABRE).astype(np.int64) - (tipos == _CIERRA)
+    prof_despues = np.cumsum(delta)
+    prof_antes = prof_despues - delta
+
+    fin_arreglo = None
+    cierre = np.flatnonzero((tipos == _CORCHETE) & (prof_antes == 0))
+    if len(cierre):
+        fin_arreglo = int(llaves[cierre[0]])
+        llaves, tipos = llaves[:cierre[0]], tipos[:cierre[0]]
+        prof_antes, prof_despues = prof_antes[:cierre[0]], prof_despues[:cierre[0]]
+
+    inicios = llaves[(tipos == _ABRE) & (prof_antes == 0)]
+    fines = llaves[(tipos == _CIERRA) & (prof_despues == 0)] + 1
+    return inicios[:len(fines)], fines, fin_arreglo
+
+
+class EscanerFeatures:
+    """Itera los Features de un FeatureCollection como bytes crudos.
+
+    `posicion` es el offset en bytes (en el archivo) justo después del último
+    Feature entregado. Con `inicio` (una `posicion` anterior) la lectura
+    continúa desde ese punto sin volver a buscar el arreglo "features".
+    """
+
+    def __init__(self, path, tamano_bloque=TAMANO_BLOQUE, inicio=0):
+        self.path = path
+        self.tamano_bloque = tamano_bloque
+        self.inicio = inicio
+        self.posicion = inicio
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            buf = b''
+            base = 0  # offset en el archivo de buf[0]
+            pos = 0
+
+            if self.inicio:
+                f.seek(self.inicio)
+                base = self.inicio
+
+            # Ubicar el inicio del arreglo "features"
+            while not self.inicio:
+                idx = buf.find(_CLAVE_FEATURES)
+                if idx != -1:
+                    arr = buf.find(b'[', idx + len(_CLAVE_FEATURES))
+                    if arr != -1:
+                        pos = arr + 1
+                        break
+                chunk = f.read(self.tamano_bloque)
+                if not chunk:
+                    return
+                buf += chunk
+
+            buf = buf[pos:]
+            base += pos
+            lectura = self.tamano_bloque
+            while True:
+                inicios, fines, fin_arreglo = _limites_features(buf)
+                for i, j in zip(inicios.tolist(), fines.tolist()):
+                    self.posicion = base + j
+                    yield buf[i:j]
+                if fin_arreglo is not None:
+                    return
+
+                # Conservar solo lo que sigue al último Feature completo
+                if len(fines):
+                    corte = int(fines[-1])
+                    base += corte
+                    buf = buf[corte:]
+                    lectura = self.tamano_bloque
+                else:
+                    # Un Feature más grande que el bloque: leer más de una vez
+                    # para no reescanear el mismo prefijo muchas veces
+                    lectura = max(lectura, len(buf))
+                chunk = f.read(lectura)
+                if not chunk:
+                    return
+                buf += chunk
+
+
+def iter_features_raw(path, tamano_bloque=TAMANO_BLOQUE):
+    """Generador de Features como bytes crudos (sin decodificar)."""
+    return iter(EscanerFeatures(path, tamano_bloque))
+
+
+def iter_features_from_featurecollection(path, tamano_bloque=TAMANO_BLOQUE):
+    """Generador que itera Features (dict) desde un GeoJSON FeatureCollection.
+
+    Los Features que no son JSON válido se omiten, igual que en el lector
+    anterior.
+    """
+    for raw in iter_features_raw(path, tamano_bloque):
+        try:
+            yield json.loads(raw)
+        except Exception:
+            pass
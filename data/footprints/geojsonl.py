@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura de archivos GeoJSONL (un Feature por línea) por rangos de bytes.
+
+El archivo se abre con mmap y se divide en rangos alineados a saltos de
+línea; cada rango se puede leer y filtrar de forma independiente (en un
+worker distinto), sin convertir antes el archivo a FeatureCollection.
+"""
+import mmap
+import os
+
+EXTENSIONES = ('.geojsonl', '.geojsons', '.jsonl', '.ndjson', '.ldjson')
+TAMANO_RANGO = 32 * 1024 * 1024
+
+
+def es_geojsonl(path):
+    return str(path).lower().endswith(EXTENSIONES)
+
+
+def rangos_por_lineas(path, tamano_rango=TAMANO_RANGO, desde=0):
+    """Divide el archivo en rangos [inicio, fin) que empiezan y terminan en
+    un límite de línea. Cada rango tiene aproximadamente `tamano_rango` bytes.
+    `desde` debe ser un inicio de línea (p. ej. el fin de un rango anterior).
+    """
+    tamano = os.path.getsize(path)
+    if tamano == 0:
+        return []
+    rangos = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        inicio = desde
+        while inicio < tamano:
+            objetivo = inicio + tamano_rango
+            if objetivo >= tamano:
+                fin = tamano
+            else:
+                salto = mm.find(b'\n', objetivo)
+                fin = tamano if salto == -1 else salto + 1
+            rangos.append((inicio, fin))
+            inicio = fin
+    return rangos
+
+
+def iter_lineas(path, inicio=0, fin=None):
+    """Generador de líneas no vacías (bytes crudos) del rango [inicio, fin)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            datos = mm[inicio:fin if fin is not None else len(mm)]
+    for linea in datos.split(b'\n'):
+        linea = linea.strip()
+        if linea:
+            yield linea
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Normalización de geometrías por arreglos: reparación y orientación.
+
+Reemplaza las copias de `make_valid` → `buffer(0)` → `orient` que había en
+los cargadores, en `cargar_municipios.py` y en
+`scripts/fix_invalid_geometries.py`. Todo se hace sobre arreglos de
+geometrías con las funciones vectorizadas de Shapely 2: `is_valid` se
+evalúa para el arreglo completo y solo las inválidas (una fracción mínima
+de los footprints) pasan por `make_valid`; las válidas no se tocan.
+
+También calcula área y perímetro en metros por lotes: las coordenadas de
+todo el lote se proyectan a MAGNA-SIRGAS Origen-Nacional (EPSG:9377) en una
+sola llamada a pyproj, y área y longitud salen de Shapely sobre el arreglo.
+"""
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from pyproj import Proj, Transformer
+from shapely.geometry import Polygon, MultiPolygon
+from shapely.geometry.polygon import orient
+
+
+def _reparar_una(g):
+    """Reparación de una sola geometría cuando `make_valid` sobre el lote
+    falla: `make_valid` y, si tampoco funciona, `buffer(0)`."""
+    try:
+        return shapely.make_valid(g)
+    except Exception:
+        try:
+            return g.buffer(0)
+        except Exception:
+            return None
+
+
+def reparar_geometrias(geoms):
+    """Devuelve un arreglo con las geometrías inválidas reparadas.
+
+    Las válidas se devuelven sin cambios; las que no se pueden reparar (o
+    siguen inválidas después de `make_valid` y `buffer(0)`) quedan en None.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    salida = geoms.copy()
+    invalidas = ~shapely.is_valid(geoms) & ~shapely.is_missing(geoms)
+    if not invalidas.any():
+        return salida
+
+    indices = np.flatnonzero(invalidas)
+    try:
+        reparadas = shapely.make_valid(geoms[indices])
+    except Exception:
+        reparadas = np.array([_reparar_una(g) for g in geoms[indices]], dtype=object)
+
+    # Las que siguen inválidas prueban con buffer(0) como último recurso
+    siguen = ~shapely.is_valid(reparadas) & ~shapely.is_missing(reparadas)
+    for j in np.flatnonzero(siguen):
+        try:
+            g = shapely.buffer(geoms[indices[j]], 0)
+            reparadas[j] = g if shapely.is_valid(g) else None
+        except Exception:
+            reparadas[j] = None
+    salida[indices] = reparadas
+    return salida
+
+
+def orientar_poligonos(geoms):
+    """Anillo exterior antihorario e interiores horarios (`orient(sign=1)`),
+    para Polygon y MultiPolygon; el resto de tipos queda igual."""
+    geoms = np.asarray(geoms, dtype=object)
+    if hasattr(shapely, 'orient_polygons'):  # Shapely >= 2.1
+        return shapely.orient_polygons(geoms, exterior_cw=False)
+    salida = geoms.copy()
+    tipos = shapely.get_type_id(geoms)
+    for i in np.flatnonzero((tipos == shapely.GeometryType.POLYGON)
+                            | (tipos == shapely.GeometryType.MULTIPOLYGON)):
+        g = geoms[i]
+        try:
+            if isinstance(g, Polygon):
+                salida[i] = orient(g, sign=1.0)
+            else:
+                salida[i] = MultiPolygon([orient(p, sign=1.0) for p in g.geoms])
+        except Exception:
+            pass
+    return salida
+
+
+def normalizar_geometrias(geoms, orientar=True):
+    """Repara las geometrías inválidas y orienta los anillos de todo el
+    arreglo. Las que no se pudieron reparar quedan en None."""
+    salida = reparar_geometrias(geoms)
+    if orientar:
+        presentes = ~shapely.is_missing(salida)
+        if presentes.any():
+            salida[presentes] = orientar_poligonos(salida[presentes])
+    return salida
+
+
+def normalizar_geometria(g, orientar=True):
+    """Versión para una sola geometría de `normalizar_geometrias`."""
+    if g is None:
+        return None
+    return normalizar_geometrias([g], orientar=orientar)[0]
+
+
+# MAGNA-SIRGAS 2018 / Origen-Nacional: proyección oficial única para Colombia
+CRS_METRICO = 'EPSG:9377'
+
+
+@lru_cache(maxsize=None)
+def _proyeccion(crs):
+    # Un Transformer por proceso (los workers lo crean en su primer lote)
+    return Transformer.from_crs('EPSG:4326', crs, always_xy=True), Proj(crs)
+
+
+def areas_perimetros(geoms, crs=CRS_METRICO):
+    """(area_m2, perimetro_m) de cada geometría lon/lat del arreglo.
+
+    Origen-Nacional es Transverse Mercator: conforme pero no equivalente, y
+    en los extremos del país la escala se aleja ~1 % de la real. Como los
+    edificios son pequeños, se corrige cada uno con el factor de escala de
+    su centroide (k² para el área y k para el perímetro), también calculado
+    por lotes.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    if not len(geoms):
+        return np.empty(0), np.empty(0)
+    transformer, proj = _proyeccion(crs)
+
+    def proyectar(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+
+    proyectadas = shapely.transform(geoms, proyectar)
+    centroides = shapely.centroid(geoms)
+    factores = proj.get_factors(shapely.get_x(centroides), shapely.get_y(centroides))
+    areas = shapely.area(proyectadas) / np.asarray(factores.areal_scale)
+    perimetros = shapely.length(proyectadas) / np.asarray(factores.meridional_scale)
+    return areas, perimetros
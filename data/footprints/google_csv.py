@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura directa de los archivos CSV.GZ de Google Open Buildings.
+
+Los cargadores leen las partes `google_partN.csv.gz` en streaming y generan
+los mismos Features que producía `scripts/convert_csv_to_geojson.py`, sin
+escribir ni volver a parsear el GeoJSON intermedio.
+
+Las filas traen `latitude`/`longitude` (centroide del edificio): antes de
+tocar el WKT se descartan con la grilla PDET las que están lejos de todo
+municipio, y solo las sobrevivientes se parsean con `shapely.from_wkt`
+vectorizado por lote.
+"""
+import csv
+import gzip
+import sys
+from itertools import islice
+
+import numpy as np
+import shapely
+
+from footprints.columnar import LoteColumnar
+from footprints.metricas import METRICAS
+from footprints.procesamiento import nuevos_conteos, procesar_geometrias, sumar_conteos
+
+EXTENSIONES = ('.csv.gz', '.csv')
+
+
+def es_csv(path):
+    return str(path).lower().endswith(EXTENSIONES)
+
+
+def abrir_csv(path):
+    """Abre un .csv o .csv.gz en modo texto."""
+    if str(path).lower().endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def _ampliar_limite_campos():
+    # Los polígonos WKT grandes superan el límite por defecto de 128 KB
+    limite = sys.maxsize
+    while True:
+        try:
+            csv.field_size_limit(limite)
+            return
+        except OverflowError:
+            limite //= 10
+
+
+def wkt_to_geojson_coords(wkt_str):
+    """Convert WKT POLYGON string to GeoJSON coordinates array.
+    Example WKT: POLYGON((-68.123 4.567, -68.124 4.568, ...))
+    or: POLYGON ((-68.123 4.567, -68.124 4.568, ...))
+    """
+    try:
+        # Remove 'POLYGON' prefix and clean up
+        wkt_clean = wkt_str.strip()
+        if wkt_clean.upper().startswith('POLYGON'):
+            wkt_clean = wkt_clean[7:].strip()  # Remove 'POLYGON'
+        
+        # Remove outer parentheses - handle both "(" and "(("
+        wkt_clean = wkt_clean.strip()
+        if wkt_clean.startswith('(('):
+            wkt_clean = wkt_clean[2:-2]  # Remove "((" and "))"
+        elif wkt_clean.startswith('('):
+            wkt_clean = wkt_clean[1:-1]  # Remove "(" and ")"
+        
+        # Split by comma to get coordinate pairs
+        pairs = wkt_clean.split(',')
+        coords = []
+        for pair in pairs:
+            parts = pair.strip().split()
+            if len(parts) >= 2:
+                try:
+                    lon = float(parts[0])
+                    lat = float(parts[1])
+                    coords.append([lon, lat])
+                except ValueError:
+                    continue
+        
+        if len(coords) < 3:  # A polygon needs at least 3 points
+            return None
+        
+        return [coords]  # Polygon exterior ring
+    except Exception as e:
+        print(f"  ⚠ Error parsing WKT: {wkt_str[:50]}... - {e}")
+        return None
+
+
+def csv_row_to_feature(row, row_num):
+    """Convert CSV row to GeoJSON Feature.
+    Expected columns: geometry (WKT) or latitude/longitude, plus other properties.
+    """
+    try:
+        # Try to find geometry column (WKT format)
+        geom = None
+        properties = {}
+        
+        for key, val in row.items():
+            key_lower = key.lower()
+            if key_lower in ('geometry', 'geom', 'wkt'):
+                # Parse WKT
+                coords = wkt_to_geojson_coords(val)
+                if coords:
+                    geom = {'type': 'Polygon', 'coordinates': coords}
+            elif key_lower == 'latitude' and 'longitude' in [k.lower() for k in row.keys()]:
+                # Point geometry from lat/lon
+                lat = float(val)
+                lon = float(row.get('longitude') or row.get('Longitude') or row.get('LONGITUDE'))
+                # For buildings we expect polygons, but if only point available, skip or use point
+                # For now, skip rows with only lat/lon (buildings should have polygons)
+                continue
+            else:
+                properties[key] = val
+        
+        if geom is None:
+            return None
+        
+        return {
+            'type': 'Feature',
+            'geometry': geom,
+            'properties': properties
+        }
+    except Exception as e:
+        print(f"  ⚠ Error en fila {row_num}: {e}")
+        return None
+
+
+def iter_filas_csv(paths, saltar=0):
+    """Generador de filas (dict) de una o más partes CSV/CSV.GZ, en orden.
+    Con `saltar` se omiten las primeras filas (al reanudar una carga)."""
+    _ampliar_limite_campos()
+
+    def filas():
+        for path in paths:
+            with abrir_csv(path) as fin:
+                yield from csv.DictReader(fin)
+    return islice(filas(), saltar, None)
+
+
+def iter_features_csv(paths):
+    """Generador de Features GeoJSON (o None si la fila no tiene polígono)
+    a partir de las partes CSV/CSV.GZ, en el orden de los archivos."""
+    for row_num, row in enumerate(iter_filas_csv(paths), start=1):
+        yield csv_row_to_feature(row, row_num)
+
+
+def _columnas(fila):
+    """(columna WKT, columna latitude, columna longitude) según el encabezado."""
+    geom = lat = lon = None
+    for key in fila:
+        key_lower = key.lower()
+        if key_lower in ('geometry', 'geom', 'wkt'):
+            geom = key
+        elif key_lower == 'latitude':
+            lat = key
+        elif key_lower == 'longitude':
+            lon = key
+    return geom, lat, lon
+
+
+def _a_float(valores):
+    salida = np.full(len(valores), np.nan)
+    for i, v in enumerate(valores):
+        try:
+            salida[i] = float(v)
+        except (TypeError, ValueError):
+            pass
+    return salida
+
+
+def procesar_filas_csv(filas, grilla_pdet, fuente):
+    """Equivalente a procesar_lote(csv_row_to_feature(...)) para un lote de
+    filas del CSV de Google, con prefiltro por lat/lon.
+
+    Las filas cuyo punto está a más de una celda de cualquier municipio se
+    cuentan como fuera de PDET (y en `descartados_rapido`) sin parsear su
+    WKT. Para el resto se usa el anillo exterior del POLYGON, igual que
+    `wkt_to_geojson_coords`, y el municipio se asigna por el centroide del
+    polígono como en los demás cargadores. Devuelve (LoteColumnar, conteos).
+    """
+    conteos = nuevos_conteos()
+    conteos['procesados'] = len(filas)
+    if not filas:
+        return LoteColumnar(fuente), conteos
+
+    col_geom, col_lat, col_lon = _columnas(filas[0])
+    with METRICAS.etapa('prefiltro', len(filas)):
+        if col_lat and col_lon:
+            lons = _a_float([f.get(col_lon) for f in filas])
+            lats = _a_float([f.get(col_lat) for f in filas])
+            lejos = grilla_pdet.lejanos(lons, lats)
+        else:
+            lejos = np.zeros(len(filas), dtype=bool)
+    n_lejos = int(lejos.sum())
+    conteos['fuera_pdet'] += n_lejos
+    conteos['descartados_rapido'] += n_lejos
+
+    sobrevivientes = [filas[i] for i in np.flatnonzero(~lejos)]
+    if col_geom is None:
+        conteos['errores'] += len(sobrevivientes)
+        return LoteColumnar(fuente), conteos
+
+    wkts = np.array([f.get(col_geom) or '' for f in sobrevivientes], dtype=object)
+    with METRICAS.etapa('parseo_wkt', len(wkts)):
+        geoms = shapely.from_wkt(wkts, on_invalid='ignore')
+    es_poligono = shapely.get_type_id(geoms) == shapely.GeometryType.POLYGON
+    validos = es_poligono & ~shapely.is_empty(geoms)
+    conteos['errores'] += int(len(geoms) - validos.sum())
+
+    exteriores = shapely.polygons(shapely.get_exterior_ring(geoms[validos]))
+    propiedades = []
+    for i in np.flatnonzero(validos):
+        fila = sobrevivientes[i]
+        propiedades.append({k: v for k, v in fila.items()
+                            if k != col_geom and not (k == col_lat and col_lon)})
+
+    lote, c = procesar_geometrias(exteriores, propiedades, grilla_pdet, fuente)
+    return lote, sumar_conteos(conteos, c)
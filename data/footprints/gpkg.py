@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura de footprints desde GeoPackage (p. ej. `google1.gpkg`).
+
+Se lee con fiona, igual que el shapefile del MGN en `cargar_municipios.py`.
+Cada Feature sale como dict GeoJSON y entra al mismo procesamiento por
+lotes que los Features de un FeatureCollection. Si la capa no está en
+EPSG:4326, las geometrías se reproyectan al leerlas.
+"""
+from itertools import islice
+
+from pyproj import CRS
+
+EXTENSIONES = ('.gpkg',)
+
+
+def es_gpkg(path):
+    return str(path).lower().endswith(EXTENSIONES)
+
+
+def _a_dict(feature):
+    # fiona >= 1.9 entrega objetos Feature/Geometry; las versiones
+    # anteriores ya entregan dicts
+    try:
+        from fiona.model import to_dict
+    except ImportError:
+        return feature
+    return to_dict(feature)
+
+
+def _es_wgs84(crs_wkt):
+    if not crs_wkt:
+        return True
+    try:
+        return CRS.from_user_input(crs_wkt).to_epsg() == 4326
+    except Exception:
+        return True
+
+
+def iter_features_gpkg(path, capa=None, saltar=0):
+    """Generador de Features GeoJSON (dict) de una capa del GeoPackage, en
+    orden. `capa` es el nombre o índice (default: la primera); con `saltar`
+    se omiten los primeros Features (al reanudar una carga)."""
+    import fiona
+    from fiona.transform import transform_geom
+
+    with fiona.open(path, 'r', layer=capa) as src:
+        reproyectar = not _es_wgs84(src.crs_wkt)
+        for feature in islice(src, saltar, None):
+            feature = _a_dict(feature)
+            if reproyectar and feature.get('geometry'):
+                feature['geometry'] = _a_dict(transform_geom(src.crs_wkt, 'EPSG:4326', feature['geometry']))
+            yield feature
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Grilla regular precalculada sobre los municipios PDET.
+
+Cada celda de la grilla (lon/lat, tamaño fijo en grados) queda marcada como:
+  - índice del municipio (>= 0): la celda está completamente en el interior
+    de un municipio, cualquier punto dentro de ella pertenece a ese municipio;
+  - RECHAZO: la celda no toca ningún municipio PDET;
+  - BORDE: la celda cruza algún límite y requiere la prueba exacta con el
+    índice STRtree.
+
+La gran mayoría de los edificios se resuelve con aritmética entera sobre
+lon/lat. La grilla se persiste junto con el índice en el artefacto de
+`footprints.cache_pdet` y solo se reconstruye cuando los municipios cambian.
+"""
+import hashlib
+
+import numpy as np
+import shapely
+
+RECHAZO = -1
+BORDE = -2
+
+# Margen para exigir que la celda esté en el interior estricto del municipio:
+# un punto exactamente sobre el límite no es `contains` para ningún municipio.
+_EPS = 1e-9
+
+
+def clave_municipios(indice_pdet):
+    """Hash estable de los códigos y geometrías (WKB) del índice PDET."""
+    h = hashlib.sha256()
+    for codigo, wkb in zip(indice_pdet.codigos, shapely.to_wkb(indice_pdet.geoms)):
+        h.update(str(codigo).encode('utf-8'))
+        h.update(wkb)
+    return h.hexdigest()
+
+
+class GrillaMunicipios:
+    """Tabla de celdas para asignar municipio con O(1) en el interior."""
+
+    def __init__(self, celdas, origen_x, origen_y, tamano, indice_pdet, clave=None):
+        self.celdas = celdas
+        self.origen_x = float(origen_x)
+        self.origen_y = float(origen_y)
+        self.tamano = float(tamano)
+        self.ny, self.nx = celdas.shape
+        self.indice_pdet = indice_pdet
+        self.codigos = np.asarray(indice_pdet.codigos, dtype=object)
+        self.clave = clave
+        self.estadisticas = {'interior': 0, 'rechazo': 0, 'borde': 0}
+        self._lejos = None
+        # Directorio del artefacto en disco, si la grilla se abrió desde uno
+        self.ruta_artefacto = None
+        # Nombre del bloque de memoria compartida, si se abrió desde uno
+        self.memoria_compartida = None
+
+    @classmethod
+    def construir(cls, indice_pdet, tamano=0.01, filas_por_bloque=64):
+        """Clasifica todas las celdas del bbox de los municipios PDET."""
+        minx, miny, maxx, maxy = shapely.total_bounds(indice_pdet.geoms)
+        nx = int(np.ceil((maxx - minx) / tamano)) or 1
+        ny = int(np.ceil((maxy - miny) / tamano)) or 1
+        celdas = np.full((ny, nx), BORDE, dtype=np.int32)
+
+        x0 = minx + np.arange(nx) * tamano
+        # Se procesa por bloques de filas para acotar la memoria de las cajas
+        for fila in range(0, ny, filas_por_bloque):
+            filas = np.arange(fila, min(fila + filas_por_bloque, ny))
+            xs, ys = np.meshgrid(x0, miny + filas * tamano)
+            xs = xs.ravel()
+            ys = ys.ravel()
+
+            cajas = shapely.box(xs, ys, xs + tamano, ys + tamano)
+            idx_caja, _ = indice_pdet.tree.query(cajas, predicate='intersects')
+            n_intersecta = np.bincount(idx_caja, minlength=len(cajas))
+
+            bloque = np.full(len(cajas), BORDE, dtype=np.int32)
+            bloque[n_intersecta == 0] = RECHAZO
+
+            # Interior: la celda (ampliada en _EPS) está dentro de un municipio
+            # y no toca ningún otro (municipios superpuestos quedan en BORDE).
+            cajas_ext = shapely.box(xs - _EPS, ys - _EPS, xs + tamano + _EPS, ys + tamano + _EPS)
+            idx_caja, idx_mpio = indice_pdet.tree.query(cajas_ext, predicate='within')
+            unica = n_intersecta[idx_caja] == 1
+            bloque[idx_caja[unica]] = idx_mpio[unica]
+
+            celdas[filas[0]:filas[-1] + 1] = bloque.reshape(len(filas), nx)
+
+        return cls(celdas, minx, miny, tamano, indice_pdet, clave=clave_municipios(indice_pdet))
+
+    def valores(self, xs, ys):
+        """Valor de celda para cada punto (RECHAZO fuera de la grilla)."""
+        xs = np.asarray(xs, dtype='float64')
+        ys = np.asarray(ys, dtype='float64')
+        valores = np.full(len(xs), RECHAZO, dtype=np.int32)
+        finitos = np.isfinite(xs) & np.isfinite(ys)
+        ix = np.zeros(len(xs), dtype=np.int64)
+        iy = np.zeros(len(xs), dtype=np.int64)
+        ix[finitos] = np.floor((xs[finitos] - self.origen_x) / self.tamano)
+        iy[finitos] = np.floor((ys[finitos] - self.origen_y) / self.tamano)
+        dentro = finitos & (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        valores[dentro] = self.celdas[iy[dentro], ix[dentro]]
+        return valores
+
+    def _mascara_lejos(self):
+        # Celdas de rechazo cuyas 8 vecinas también son de rechazo, con un
+        # marco de una celda alrededor de la grilla (índices desplazados en 1)
+        if self._lejos is None:
+            rechazo = np.pad(self.celdas == RECHAZO, 2, constant_values=True)
+            lejos = np.ones((self.ny + 2, self.nx + 2), dtype=bool)
+            for dy in (0, 1, 2):
+                for dx in (0, 1, 2):
+                    lejos &= rechazo[dy:dy + self.ny + 2, dx:dx + self.nx + 2]
+            self._lejos = lejos
+        return self._lejos
+
+    def lejanos(self, xs, ys):
+        """True para los puntos que están a más de una celda de cualquier
+        municipio PDET.
+
+        Sirve para descartar un edificio a partir de un punto aproximado
+        (p. ej. la lat/lon que trae Google o la primera coordenada) antes de
+        construir su geometría: el centroide real queda a menos de una celda
+        de ese punto. Los puntos no finitos devuelven False (van a la prueba
+        completa).
+        """
+        xs = np.asarray(xs, dtype='float64')
+        ys = np.asarray(ys, dtype='float64')
+        lejos = self._mascara_lejos()
+        resultado = np.zeros(len(xs), dtype=bool)
+        finitos = np.isfinite(xs) & np.isfinite(ys)
+        ix = np.zeros(len(xs), dtype=np.int64)
+        iy = np.zeros(len(xs), dtype=np.int64)
+        ix[finitos] = np.floor((xs[finitos] - self.origen_x) / self.tamano) + 1
+        iy[finitos] = np.floor((ys[finitos] - self.origen_y) / self.tamano) + 1
+        dentro = (ix >= 0) & (ix < self.nx + 2) & (iy >= 0) & (iy < self.ny + 2)
+        resultado[finitos & ~dentro] = True
+        sel = finitos & dentro
+        resultado[sel] = lejos[iy[sel], ix[sel]]
+        return resultado
+
+    def buscar_lote(self, xs, ys):
+        """Misma interfaz que IndiceMunicipios.buscar_lote.
+
+        Las celdas interiores y de rechazo se resuelven directamente; solo
+        los puntos en celdas de borde pasan por la prueba exacta.
+        """
+        xs = np.asarray(xs, dtype='float64')
+        ys = np.asarray(ys, dtype='float64')
+        valores = self.valores(xs, ys)
+        codigos = np.full(len(xs), None, dtype=object)
+
+        interior = valores >= 0
+        codigos[interior] = self.codigos[valores[interior]]
+
+        borde = valores == BORDE
+        if borde.any():
+            codigos[borde] = self.indice_pdet.buscar_lote(xs[borde], ys[borde])
+
+        self.estadisticas['interior'] += int(interior.sum())
+        self.estadisticas['borde'] += int(borde.sum())
+        self.estadisticas['rechazo'] += int(len(xs) - interior.sum() - borde.sum())
+        return codigos
+
+    def resumen_celdas(self):
+        total = self.celdas.size
+        interior = int((self.celdas >= 0).sum())
+        rechazo = int((self.celdas == RECHAZO).sum())
+        return {'total': total, 'interior': interior, 'rechazo': rechazo, 'borde': total - interior - rechazo}
+
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice espacial de municipios PDET para asignar `codigo_municipio`.
+
+Se construye una sola vez al inicio de la carga: un STRtree de Shapely sobre
+las geometrías de `mgn_municipios_pdet` y geometrías preparadas para la prueba
+exacta. Cada búsqueda recorre solo los municipios cuyo bbox contiene el punto,
+en vez de probar `contains` contra los 170 polígonos.
+"""
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import Point, shape
+
+
+def cargar_municipios_shapes(pdet_collection):
+    """Lee `mgn_municipios_pdet` y devuelve la lista de municipios con su
+    geometría Shapely: [{'codigo', 'nombre', 'shape'}, ...].
+    """
+    municipios_shapes = []
+    cursor = pdet_collection.find({}, {
+        'codigo_municipio': 1,
+        'nombre_municipio': 1,
+        'departamento': 1,
+        'geometry': 1
+    })
+    for mpio in cursor:
+        try:
+            geom = shape(mpio['geometry'])
+            municipios_shapes.append({
+                'codigo': mpio['codigo_municipio'],
+                'nombre': mpio.get('nombre_municipio', ''),
+                'shape': geom
+            })
+        except Exception as e:
+            print(f"  ⚠ Error procesando municipio {mpio.get('codigo_municipio')}: {e}")
+    return municipios_shapes
+
+
+class IndiceMunicipios:
+    """STRtree + geometrías preparadas sobre los municipios PDET."""
+
+    def __init__(self, municipios_shapes):
+        self.codigos = [m['codigo'] for m in municipios_shapes]
+        self.nombres = [m.get('nombre', '') for m in municipios_shapes]
+        self.geoms = np.array([m['shape'] for m in municipios_shapes], dtype=object)
+        shapely.prepare(self.geoms)
+        self.tree = STRtree(self.geoms)
+
+    @classmethod
+    def desde_wkb(cls, codigos, nombres, wkbs):
+        """Reconstruye el índice a partir de la salida de `a_wkb`."""
+        geoms = shapely.from_wkb(np.asarray(wkbs, dtype=object))
+        return cls([{'codigo': c, 'nombre': n, 'shape': g} for c, n, g in zip(codigos, nombres, geoms)])
+
+    def a_wkb(self):
+        """(codigos, nombres, wkbs): forma serializable para otros procesos."""
+        return list(self.codigos), list(self.nombres), list(shapely.to_wkb(self.geoms))
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def buscar(self, lon, lat):
+        """Devuelve el `codigo_municipio` que contiene el punto, o None."""
+        point = Point(lon, lat)
+        # Candidatos por bbox; se ordenan para respetar el orden original
+        # de la colección si dos municipios comparten un borde.
+        for i in np.sort(self.tree.query(point)):
+            if self.geoms[i].contains(point):
+                return self.codigos[i]
+        return None
+
+    def buscar_lote(self, xs, ys):
+        """Versión vectorizada de `buscar` para arreglos de lon/lat.
+
+        Evalúa todos los puntos del lote en una sola consulta al STRtree
+        (predicado `within`, equivalente a `contains` visto desde el
+        municipio). Devuelve un arreglo de objetos con el `codigo_municipio`
+        de cada punto o None si está fuera de PDET.
+        """
+        puntos = shapely.points(np.asarray(xs, dtype='float64'), np.asarray(ys, dtype='float64'))
+        codigos = np.full(len(puntos), None, dtype=object)
+        idx_punto, idx_mpio = self.tree.query(puntos, predicate='within')
+        if len(idx_punto):
+            # Si un punto cae en dos municipios gana el primero de la colección,
+            # igual que en `buscar`: se ordena por (punto, municipio) y se
+            # deja la primera pareja de cada punto.
+            orden = np.lexsort((idx_mpio, idx_punto))
+            unicos, primeros = np.unique(idx_punto[orden], return_index=True)
+            codigos[unicos] = np.asarray(self.codigos, dtype=object)[idx_mpio[orden][primeros]]
+        return codigos
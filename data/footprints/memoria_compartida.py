@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice PDET en memoria compartida para cargas concurrentes.
+
+`cargar_footprints.py` abre (o construye) el artefacto de
+`footprints.cache_pdet` una sola vez y copia su contenido a un bloque de
+`multiprocessing.shared_memory`. Los cargadores que lanza, y los workers de
+cada uno, reciben solo el nombre del bloque (variable `PDET_SHM_NAME`) y
+leen de ahí la tabla de celdas sin copiarla; el WKB de los municipios se
+decodifica una vez por proceso para armar el STRtree.
+
+Estructura del bloque:
+
+  [8 bytes: largo del encabezado][encabezado JSON][relleno a 8 bytes]
+  [celdas int32][offsets WKB int64][WKB concatenados]
+
+El encabezado guarda la versión, la clave del artefacto, los parámetros de
+la grilla, los códigos y nombres, y la posición de cada sección.
+"""
+import json
+import time
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import shapely
+
+from footprints.cache_pdet import VERSION_ARTEFACTO
+from footprints.grilla_pdet import GrillaMunicipios
+from footprints.indice_pdet import IndiceMunicipios
+
+_LARGO = struct.Struct('<Q')
+
+
+def _alinear(n, a=8):
+    return (n + a - 1) // a * a
+
+
+def publicar_grilla(grilla, nombre=None):
+    """Copia `grilla` a un bloque nuevo de memoria compartida.
+
+    Devuelve el SharedMemory; quien lo crea debe llamar a `close()` y
+    `unlink()` cuando terminen los procesos que lo usan.
+    """
+    celdas = np.ascontiguousarray(grilla.celdas, dtype=np.int32)
+    wkbs = shapely.to_wkb(grilla.indice_pdet.geoms)
+    offsets = np.zeros(len(wkbs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(w) for w in wkbs])
+
+    encabezado = {
+        'version': VERSION_ARTEFACTO,
+        'clave': grilla.clave,
+        'origen_x': grilla.origen_x,
+        'origen_y': grilla.origen_y,
+        'tamano': grilla.tamano,
+        'forma': list(celdas.shape),
+        'codigos': list(grilla.indice_pdet.codigos),
+        'nombres': list(grilla.indice_pdet.nombres),
+    }
+    # Las posiciones dependen del largo del encabezado, que depende de las
+    # posiciones: se fijan con un largo reservado generoso
+    texto = json.dumps(encabezado, ensure_ascii=False).encode('utf-8')
+    inicio_celdas = _alinear(_LARGO.size + len(texto) + 256)
+    inicio_offsets = _alinear(inicio_celdas + celdas.nbytes)
+    inicio_wkb = inicio_offsets + offsets.nbytes
+    encabezado.update(celdas=inicio_celdas, offsets=inicio_offsets, wkb=inicio_wkb)
+    texto = json.dumps(encabezado, ensure_ascii=False).encode('utf-8')
+    total = inicio_wkb + int(offsets[-1])
+
+    shm = shared_memory.SharedMemory(name=nombre, create=True, size=total)
+    buf = shm.buf
+    buf[:_LARGO.size] = _LARGO.pack(len(texto))
+    buf[_LARGO.size:_LARGO.size + len(texto)] = texto
+    np.ndarray(celdas.shape, dtype=np.int32, buffer=buf, offset=inicio_celdas)[:] = celdas
+    np.ndarray(offsets.shape, dtype=np.int64, buffer=buf, offset=inicio_offsets)[:] = offsets
+    posicion = inicio_wkb
+    for w in wkbs:
+        buf[posicion:posicion + len(w)] = w
+        posicion += len(w)
+    return shm
+
+
+def abrir_grilla_compartida(nombre):
+    """Abre la grilla publicada en el bloque `nombre`.
+
+    Devuelve (grilla, construido, segundos) como `obtener_indice_pdet`;
+    construido siempre es False. La tabla de celdas es una vista de solo
+    lectura sobre el bloque, que queda referenciado desde la grilla.
+    """
+    inicio = time.perf_counter()
+    shm = shared_memory.SharedMemory(name=nombre, create=False)
+    # En Python < 3.13 el resource_tracker de este proceso borraría el bloque
+    # al salir aunque no lo haya creado; el dueño es el orquestador
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    buf = shm.buf
+    largo, = _LARGO.unpack(bytes(buf[:_LARGO.size]))
+    encabezado = json.loads(bytes(buf[_LARGO.size:_LARGO.size + largo]).decode('utf-8'))
+    if encabezado.get('version') != VERSION_ARTEFACTO:
+        shm.close()
+        raise ValueError(f"versión {encabezado.get('version')} del índice compartido no soportada")
+
+    celdas = np.ndarray(tuple(encabezado['forma']), dtype=np.int32, buffer=buf,
+                        offset=encabezado['celdas'])
+    celdas.flags.writeable = False
+    n = len(encabezado['codigos'])
+    offsets = np.ndarray((n + 1,), dtype=np.int64, buffer=buf, offset=encabezado['offsets'])
+    base = encabezado['wkb']
+    wkbs = [bytes(buf[base + a:base + b]) for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+    indice = IndiceMunicipios.desde_wkb(encabezado['codigos'], encabezado['nombres'], wkbs)
+    grilla = GrillaMunicipios(celdas, encabezado['origen_x'], encabezado['origen_y'],
+                              encabezado['tamano'], indice, clave=encabezado['clave'])
+    grilla.memoria_compartida = nombre
+    grilla._shm = shm
+    return grilla, False, time.perf_counter() - inicio
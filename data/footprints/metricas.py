@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentación de las cargas: tiempo por etapa, rendimiento, memoria y colas.
+
+Cada etapa del procesamiento (lectura, decodificación JSON, centroides,
+búsqueda PDET, normalización, codificación BSON, inserción, ...) se mide con
+`METRICAS.etapa(nombre, items)`. Se acumulan llamadas, ítems, tiempo de
+pared y tiempo de CPU del hilo que la ejecuta. Con `--workers` cada worker
+mide en su propia instancia y devuelve una instantánea con cada resultado,
+que el proceso principal suma a la suya (como las estadísticas de la
+grilla). Por eso, con varios procesos, el tiempo de una etapa es la suma de
+todos ellos y puede superar la duración de la carga.
+
+Las colas (batches esperando escritura, tareas en vuelo en el pool) se
+muestrean en cada envío: se guarda la profundidad máxima y la promedio.
+
+Al terminar, el motor escribe un manifiesto JSON de la carga y, si se pide,
+un archivo de texto para el textfile collector de Prometheus.
+"""
+import os
+import json
+import time
+import resource
+import threading
+from contextlib import contextmanager
+
+
+class Metricas:
+    """Acumulador de tiempos por etapa y profundidad de colas (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            # nombre -> [llamadas, items, pared_s, cpu_s]
+            self.etapas = {}
+            # nombre -> [muestras, suma, maximo]
+            self.colas = {}
+
+    def sumar(self, nombre, items, pared, cpu, llamadas=1):
+        with self._lock:
+            e = self.etapas.setdefault(nombre, [0, 0, 0.0, 0.0])
+            e[0] += llamadas
+            e[1] += items
+            e[2] += pared
+            e[3] += cpu
+
+    @contextmanager
+    def etapa(self, nombre, items=0):
+        pared = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.sumar(nombre, items, time.perf_counter() - pared, time.thread_time() - cpu)
+
+    def medir_lotes(self, lotes, nombre='lectura'):
+        """Mide el tiempo de producir cada lote de un iterable (la lectura y
+        el parseo que haga el generador); los ítems son los elementos."""
+        lotes = iter(lotes)
+        while True:
+            pared = time.perf_counter()
+            cpu = time.thread_time()
+            try:
+                lote = next(lotes)
+            except StopIteration:
+                return
+            self.sumar(nombre, len(lote), time.perf_counter() - pared, time.thread_time() - cpu)
+            yield lote
+
+    def muestrear_cola(self, nombre, profundidad):
+        with self._lock:
+            c = self.colas.setdefault(nombre, [0, 0, 0])
+            c[0] += 1
+            c[1] += profundidad
+            c[2] = max(c[2], profundidad)
+
+    def instantanea(self):
+        """Copia serializable para enviarla desde un worker."""
+        with self._lock:
+            return {'etapas': {k: list(v) for k, v in self.etapas.items()},
+                    'colas': {k: list(v) for k, v in self.colas.items()}}
+
+    def combinar(self, instantanea):
+        for nombre, (llamadas, items, pared, cpu) in instantanea['etapas'].items():
+            self.sumar(nombre, items, pared, cpu, llamadas)
+        with self._lock:
+            for nombre, (muestras, suma, maximo) in instantanea['colas'].items():
+                c = self.colas.setdefault(nombre, [0, 0, 0])
+                c[0] += muestras
+                c[1] += suma
+                c[2] = max(c[2], maximo)
+
+    def resumen(self):
+        """Etapas y colas con los valores derivados (ítems/s, promedios)."""
+        with self._lock:
+            etapas = {
+                nombre: {
+                    'llamadas': llamadas,
+                    'items': items,
+                    'pared_s': round(pared, 4),
+                    'cpu_s': round(cpu, 4),
+                    'items_por_s': round(items / pared, 1) if pared > 0 else None,
+                }
+                for nombre, (llamadas, items, pared, cpu) in self.etapas.items()
+            }
+            colas = {
+                nombre: {'muestras': muestras, 'max': maximo,
+                         'promedio': round(suma / muestras, 2) if muestras else 0}
+                for nombre, (muestras, suma, maximo) in self.colas.items()
+            }
+        return {'etapas': etapas, 'colas': colas}
+
+
+# Instancia del proceso (cada worker tiene la suya)
+METRICAS = Metricas()
+
+
+def rss_maximo_mb():
+    """Pico de memoria residente del proceso y de sus hijos ya terminados
+    (los workers del pool), en MB. ru_maxrss está en KB en Linux."""
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {'principal': round(propio, 1), 'workers': round(hijos, 1)}
+
+
+def _escribir_atomico(ruta, texto):
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    tmp = f'{ruta}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(tmp, ruta)
+
+
+def escribir_manifiesto(ruta, manifiesto):
+    _escribir_atomico(ruta, json.dumps(manifiesto, ensure_ascii=False, indent=2, default=str) + '\n')
+
+
+def _etiquetas(**valores):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in valores.items()) + '}'
+
+
+def escribir_prometheus(ruta, manifiesto):
+    """Métricas de la carga en el formato de texto de Prometheus (para el
+    textfile collector de node_exporter)."""
+    coleccion = manifiesto['coleccion']
+    lineas = []
+
+    def metrica(nombre, tipo, ayuda, muestras):
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        for etiquetas, valor in muestras:
+            lineas.append(f'{nombre}{_etiquetas(coleccion=coleccion, **etiquetas)} {valor}')
+
+    etapas = manifiesto['etapas']
+    metrica('etl_duracion_segundos', 'gauge', 'Duración de la última carga',
+            [({}, manifiesto['duracion_s'])])
+    metrica('etl_ultima_carga_timestamp_segundos', 'gauge', 'Fin de la última carga (epoch)',
+            [({}, manifiesto['fin_epoch'])])
+    metrica('etl_exito', 'gauge', '1 si la última carga terminó bien',
+            [({}, int(manifiesto['resultado'] == 'ok'))])
+    metrica('etl_documentos', 'gauge', 'Conteos del procesamiento de la última carga',
+            [({'tipo': k}, v) for k, v in manifiesto['conteos'].items()])
+    metrica('etl_escritura_documentos', 'gauge', 'Resultado de la escritura de la última carga',
+            [({'tipo': k}, v) for k, v in manifiesto['escritura'].items()])
+    metrica('etl_etapa_segundos', 'gauge', 'Tiempo de pared acumulado por etapa',
+            [({'etapa': k}, v['pared_s']) for k, v in etapas.items()])
+    metrica('etl_etapa_cpu_segundos', 'gauge', 'Tiempo de CPU acumulado por etapa',
+            [({'etapa': k}, v['cpu_s']) for k, v in etapas.items()])
+    metrica('etl_etapa_items', 'gauge', 'Ítems procesados por etapa',
+            [({'etapa': k}, v['items']) for k, v in etapas.items()])
+    metrica('etl_rss_maximo_bytes', 'gauge', 'Pico de memoria residente',
+            [({'proceso': k}, int(v * 1024 * 1024)) for k, v in manifiesto['rss_max_mb'].items()])
+    metrica('etl_cola_profundidad_maxima', 'gauge', 'Profundidad máxima de cada cola',
+            [({'cola': k}, v['max']) for k, v in manifiesto['colas'].items()])
+    servidor = manifiesto.get('servidor') or {}
+    if servidor.get('disponible'):
+        metrica('etl_servidor_contador_delta', 'gauge', 'Diferencia de contadores de serverStatus durante la carga',
+                [({'contador': k}, v['delta']) for k, v in servidor['contadores'].items()])
+        metrica('etl_servidor_medida_maxima', 'gauge', 'Máximo de medidas de serverStatus durante la carga',
+                [({'medida': k}, v['max']) for k, v in servidor['medidas'].items()])
+        final = servidor['coleccion']['final'] or {}
+        metrica('etl_indice_bytes', 'gauge', 'Tamaño de cada índice de la colección al terminar',
+                [({'indice': k}, v) for k, v in final.get('indices', {}).items()])
+        maximos = servidor['coleccion'].get('max') or {}
+        metrica('etl_indice_bytes_maximo', 'gauge', 'Tamaño máximo de cada índice observado durante la carga',
+                [({'indice': k}, v) for k, v in maximos.get('indices', {}).items()])
+    _escribir_atomico(ruta, '\n'.join(lineas) + '\n')
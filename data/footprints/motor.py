@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de carga de building footprints (solo PDET), común a todas las fuentes.
+
+`cargar_google_footprints.py` y `cargar_microsoft_footprints.py` solo llaman
+a `cargar('google')` / `cargar('microsoft')`. Aquí están, una sola vez, los
+pasos de la carga: conexión, índice PDET (artefacto en disco o memoria
+compartida), checkpoints y modo incremental, procesamiento en paralelo,
+escritura en segundo plano con batch adaptativo, índices, publicación de
+staging y verificación final. Lo que depende de la fuente está en
+`footprints.fuentes`: la `Fuente` (colección y variables de entorno) y el
+adaptador que lee el formato de la entrada.
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+from collections import deque
+
+from bson import ObjectId
+from pymongo import MongoClient, GEOSPHERE
+
+from footprints.cache_pdet import obtener_indice_pdet
+from footprints.checkpoint import SIN_LIMITE, Checkpoint, enviado_hasta, firma_entrada, leer_checkpoint
+from footprints.escritor import ControladorBatch, ErrorEscritor, EscritorMongo
+from footprints.fuentes import FUENTES, elegir_lector
+from footprints.memoria_compartida import abrir_grilla_compartida
+from footprints.metricas import METRICAS, escribir_manifiesto, escribir_prometheus, rss_maximo_mb
+from footprints.procesamiento import nuevos_conteos
+from footprints.servidor import MonitorServidor
+
+# Configuración común a todas las fuentes
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://mongo-upme:27017/')
+DB_NAME = os.getenv('DB_NAME', 'dba_proyectofinal')
+PDET_COLLECTION = 'mgn_municipios_pdet'
+PDET_CACHE_DIR = os.getenv('PDET_CACHE_DIR', 'cache/pdet')
+# Bloque de memoria compartida con el índice; lo define cargar_footprints.py
+PDET_SHM_NAME = os.getenv('PDET_SHM_NAME', '')
+GRID_CELL_DEG = float(os.getenv('PDET_GRID_CELL_DEG', '0.01'))
+RANGE_MB = int(os.getenv('GEOJSONL_RANGE_MB', '32'))
+GPKG_LAYER = os.getenv('GPKG_LAYER') or None
+ADAPTIVE_BATCH = os.getenv('ETL_ADAPTIVE_BATCH', '1') != '0'
+BATCH_MIN = int(os.getenv('ETL_BATCH_MIN', '500'))
+BATCH_MAX = int(os.getenv('ETL_BATCH_MAX', '50000'))
+BATCH_MAX_MB = float(os.getenv('ETL_BATCH_MAX_MB', '16'))
+INSERT_TARGET_MS = float(os.getenv('ETL_INSERT_TARGET_MS', '500'))
+INSERT_RETRIES = int(os.getenv('ETL_INSERT_RETRIES', '3'))
+RETRY_BACKOFF_S = float(os.getenv('ETL_RETRY_BACKOFF_S', '1'))
+# Manifiesto JSON de cada carga y, opcional, métricas para Prometheus
+MANIFEST_DIR = os.getenv('ETL_MANIFEST_DIR', 'manifiestos')
+PROMETHEUS_DIR = os.getenv('ETL_PROMETHEUS_DIR', '')
+# Muestreo de serverStatus / $collStats durante la carga (0 lo desactiva)
+SERVER_STATS_INTERVAL_S = float(os.getenv('ETL_SERVER_STATS_INTERVAL_S', '5'))
+
+
+def _argumentos(fuente, argv=None):
+    parser = argparse.ArgumentParser(description=f'Carga {fuente.nombre} building footprints (solo PDET)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('ETL_WORKERS', '1')),
+                        help='Procesos para filtrar y normalizar lotes en paralelo (default: ETL_WORKERS o 1)')
+    parser.add_argument('--writers', type=int, default=int(os.getenv('ETL_WRITERS', '1')),
+                        help='Hilos que insertan en MongoDB en segundo plano (default: ETL_WRITERS o 1)')
+    parser.add_argument('--write-queue', type=int, default=int(os.getenv('ETL_WRITE_QUEUE', '4')),
+                        help='Batches en espera de escritura antes de frenar el parseo (default: ETL_WRITE_QUEUE o 4)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continuar desde el último checkpoint en vez de empezar de cero')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Upsert por geom_hash sobre la colección publicada en vez de recargarla')
+    parser.add_argument('--prune', action='store_true',
+                        help='Con --incremental: borrar las huellas que ya no están en la entrada')
+    parser.add_argument('entradas', nargs='*',
+                        help=f'Un GeoJSON/GeoJSONL/GPKG o una o más partes CSV.GZ '
+                             f'(default: {fuente.variable_entrada})')
+    args = parser.parse_args(argv)
+    if args.prune and not args.incremental:
+        parser.error('--prune solo se puede usar con --incremental')
+    return args
+
+
+def _salir(client, codigo=1):
+    client.close()
+    sys.exit(codigo)
+
+
+def _cargar_indice_pdet(client, pdet_collection):
+    """Índice y grilla desde el artefacto en disco; solo se reconstruyen
+    (trayendo las geometrías) si cambió la colección de municipios. En una
+    carga concurrente se usan los del orquestador, en memoria compartida."""
+    print("\n" + "="*60)
+    print("CARGANDO MUNICIPIOS PDET EN MEMORIA...")
+    print("="*60)
+
+    try:
+        if PDET_SHM_NAME:
+            grilla_pdet, construida, segundos = abrir_grilla_compartida(PDET_SHM_NAME)
+        else:
+            grilla_pdet, construida, segundos = obtener_indice_pdet(pdet_collection, PDET_CACHE_DIR, GRID_CELL_DEG)
+
+        if grilla_pdet is None:
+            print("✗ ERROR: No hay municipios PDET en la base de datos.")
+            print("  Ejecuta primero: python3 /app/scripts/create_mgn_municipios_pdet.py")
+            _salir(client)
+
+        print(f"✓ Índice espacial STRtree listo ({len(grilla_pdet.indice_pdet)} municipios)")
+        print(f"✓ Índice PDET {'construido y guardado' if construida else 'abierto'} en {segundos:.2f} s: "
+              f"{'memoria compartida ' + PDET_SHM_NAME if PDET_SHM_NAME else grilla_pdet.ruta_artefacto or PDET_CACHE_DIR}")
+        celdas = grilla_pdet.resumen_celdas()
+        print(f"  Celdas de {GRID_CELL_DEG}°: {celdas['total']:,} | Interior: {celdas['interior']:,} | "
+              f"Rechazo: {celdas['rechazo']:,} | Borde: {celdas['borde']:,}")
+        return grilla_pdet
+
+    except Exception as e:
+        print(f"✗ ERROR al cargar municipios PDET: {e}")
+        _salir(client)
+
+
+def _verificar_entradas(client, entradas, lector):
+    """Entradas que se van a leer; termina la carga si no sirven."""
+    if lector.varias_entradas:
+        # Partes CSV.GZ: se omiten las que falten, igual que convert_csv_to_geojson.py
+        for p in entradas:
+            if not os.path.exists(p):
+                print(f"  ⚠ Archivo no encontrado: {p}")
+        entradas = [p for p in entradas if os.path.exists(p)]
+    elif len(entradas) > 1:
+        print("✗ ERROR: Solo se admiten varias entradas si todas son partes CSV.GZ")
+        _salir(client)
+
+    if not entradas or not os.path.exists(entradas[0]):
+        print(f"✗ ERROR: No se encontró el archivo '{entradas[0] if entradas else ''}'")
+        _salir(client)
+    print(f"✓ Entrada: {lector.nombre} ({', '.join(entradas)})")
+    return entradas
+
+
+def _crear_indices(destino):
+    """Crea los índices que faltan; devuelve False si alguno falló (la
+    colección no se debe publicar así)."""
+    print("\n" + "="*60)
+    print("CREANDO ÍNDICES...")
+    print("="*60)
+
+    try:
+        destino.create_index([("geometry", GEOSPHERE)])
+        print("✓ Índice 2dsphere en 'geometry'")
+
+        destino.create_index([("centroid", GEOSPHERE)])
+        print("✓ Índice 2dsphere en 'centroid'")
+
+        destino.create_index([("building_id", 1)], unique=True)
+        print("✓ Índice único en 'building_id'")
+
+        destino.create_index([("geom_hash", 1)], unique=True)
+        print("✓ Índice único en 'geom_hash'")
+
+        destino.create_index([("codigo_municipio", 1)])
+        print("✓ Índice en 'codigo_municipio'")
+
+        destino.create_index([("area_m2", 1)])
+        print("✓ Índice en 'area_m2'")
+
+    except Exception as e:
+        print(f"✗ ERROR al crear índices: {e}")
+        return False
+    return True
+
+
+def _verificacion_final(collection):
+    print("\n" + "="*60)
+    print("VERIFICACIÓN FINAL")
+    print("="*60)
+
+    count = collection.count_documents({})
+    print(f"✓ Documentos en colección: {count:,}")
+
+    # Verificar que TODOS tienen codigo_municipio
+    sin_codigo = collection.count_documents({'codigo_municipio': None})
+    print(f"✓ Documentos sin codigo_municipio: {sin_codigo}")
+
+    if sin_codigo > 0:
+        print("⚠ ADVERTENCIA: Hay documentos sin código de municipio")
+
+    # Mostrar ejemplo
+    ejemplo = collection.find_one()
+    if ejemplo:
+        print(f"\n📄 Ejemplo de documento:")
+        print(f"  - building_id: {ejemplo['building_id']}")
+        print(f"  - fuente: {ejemplo['fuente']}")
+        print(f"  - codigo_municipio: {ejemplo['codigo_municipio']}")
+        print(f"  - area_m2: {ejemplo['area_m2']:.2f}")
+        print(f"  - perimeter_m: {ejemplo.get('perimeter_m', 0):.2f}")
+
+    # Estadísticas por municipio
+    print("\n📊 Top 5 municipios con más edificios:")
+    pipeline = [
+        {'$group': {
+            '_id': '$codigo_municipio',
+            'count': {'$sum': 1},
+            'area_total': {'$sum': '$area_m2'}
+        }},
+        {'$sort': {'count': -1}},
+        {'$limit': 5}
+    ]
+
+    for doc in collection.aggregate(pipeline):
+        print(f"  Municipio {doc['_id']}: {doc['count']:,} edificios, {doc['area_total']/10000:.2f} ha")
+
+
+def _imprimir_etapas():
+    etapas = METRICAS.resumen()['etapas']
+    if not etapas:
+        return
+    print("  ⏱️  Tiempo por etapa (pared / CPU, sumado entre workers):")
+    for nombre, e in sorted(etapas.items(), key=lambda kv: -kv[1]['pared_s']):
+        ritmo = f" ({e['items_por_s']:,.0f}/s)" if e['items_por_s'] else ''
+        print(f"    {nombre}: {e['pared_s']:.2f} s / {e['cpu_s']:.2f} s | {e['items']:,} ítems{ritmo}")
+
+
+def _imprimir_servidor(servidor):
+    if not servidor['disponible']:
+        return
+    c, m = servidor['contadores'], servidor['medidas']
+    partes = []
+    if 'inserts' in c:
+        partes.append(f"inserts {c['inserts']['delta']:,} ({c['inserts']['por_s'] or 0:,.0f}/s)")
+    if 'journal_fsync' in c:
+        ms = c.get('journal_fsync_us', {}).get('delta', 0) / 1000
+        partes.append(f"fsync del journal {c['journal_fsync']['delta']:,} ({ms:,.0f} ms)")
+    if 'checkpoints' in c:
+        ms = c.get('checkpoint_total_ms', {}).get('delta', 0)
+        partes.append(f"checkpoints {c['checkpoints']['delta']:,} ({ms:,} ms)")
+    print(f"  🖥️  Servidor ({servidor['muestras']} muestras): {' | '.join(partes) or 'sin contadores'}")
+    if 'cache_bytes_sucios' in m:
+        maximo = m.get('cache_maximo_bytes', {}).get('max')
+        de = f" de {maximo / 1024**2:,.0f} MB" if maximo else ''
+        print(f"    Caché WiredTiger: sucios máx {m['cache_bytes_sucios']['max'] / 1024**2:,.1f} MB{de}")
+    final = servidor['coleccion']['final']
+    if final:
+        indices = ', '.join(f"{k} {v / 1024**2:,.1f} MB" for k, v in final['indices'].items())
+        print(f"    {servidor['coleccion']['nombre']}: datos {final['bytes'] / 1024**2:,.1f} MB | índices: {indices}")
+
+
+def _registrar_carga(fuente, args, carga_id, entradas, lector, inicio, resultado, conteos,
+                     grilla_pdet, escritor, controlador, monitor):
+    """Escribe el manifiesto de la carga (y el archivo de Prometheus si
+    ETL_PROMETHEUS_DIR está definido); un error aquí no detiene la carga."""
+    if monitor:
+        monitor.detener()
+    fin = time.time()
+    manifiesto = {
+        'fuente': fuente.nombre,
+        'coleccion': fuente.coleccion,
+        'carga_id': carga_id,
+        'resultado': resultado,
+        'inicio': datetime.utcfromtimestamp(inicio).isoformat(),
+        'fin': datetime.utcfromtimestamp(fin).isoformat(),
+        'fin_epoch': round(fin, 3),
+        'duracion_s': round(fin - inicio, 3),
+        'entrada': {'formato': lector.nombre, 'archivos': firma_entrada(entradas)},
+        'opciones': {'workers': args.workers, 'writers': args.writers, 'write_queue': args.write_queue,
+                     'resume': args.resume, 'incremental': args.incremental, 'prune': args.prune},
+        'conteos': dict(conteos),
+        'items_por_s': round(conteos['procesados'] / (fin - inicio), 1) if fin > inicio else None,
+        'grilla': dict(grilla_pdet.estadisticas),
+        'escritura': {'insertados': escritor.insertados, 'actualizados': escritor.actualizados,
+                      'sin_cambios': escritor.sin_cambios,
+                      'reintentados': escritor.reintentados, 'errores': escritor.errores},
+        # Lo que vio el servidor en el mismo período, junto al ritmo del cliente
+        'servidor': monitor.resumen() if monitor else None,
+        'batches': controlador.resumen(),
+        'rss_max_mb': rss_maximo_mb(),
+    }
+    manifiesto.update(METRICAS.resumen())
+    try:
+        ruta = os.path.join(MANIFEST_DIR, f"{fuente.coleccion}_{datetime.utcfromtimestamp(inicio):%Y%m%dT%H%M%S}.json")
+        escribir_manifiesto(ruta, manifiesto)
+        print(f"✓ Manifiesto de la carga: {ruta}")
+        if PROMETHEUS_DIR:
+            ruta = os.path.join(PROMETHEUS_DIR, f"etl_{fuente.coleccion}.prom")
+            escribir_prometheus(ruta, manifiesto)
+            print(f"✓ Métricas Prometheus: {ruta}")
+    except Exception as e:
+        print(f"⚠ No se pudo escribir el manifiesto de la carga: {e}")
+
+
+def cargar(clave, argv=None):
+    """Carga completa de la fuente `clave` de `FUENTES` ('google', 'microsoft')."""
+    fuente = FUENTES[clave]
+    args = _argumentos(fuente, argv)
+    COLLECTION_NAME = fuente.coleccion
+    STAGING_COLLECTION = f'{COLLECTION_NAME}_staging'
+    CHECKPOINT_FILE = os.getenv('ETL_CHECKPOINT_FILE', f'cache/checkpoint_{COLLECTION_NAME}.json')
+    DEAD_LETTER_FILE = os.getenv('ETL_DEAD_LETTER_FILE', f'dead_letter/{COLLECTION_NAME}.jsonl')
+    BATCH_SIZE = int(os.getenv(fuente.variable_batch, '5000'))
+    entradas = args.entradas or [fuente.entrada()]
+    inicio = time.time()
+
+    print("="*60)
+    print(f"CARGA DE {fuente.nombre.upper()} BUILDING FOOTPRINTS - SOLO PDET")
+    print("Con filtrado espacial y asignación de código de municipio")
+    print("="*60)
+
+    # 1. Conectar a MongoDB
+    try:
+        client = MongoClient(MONGO_URI)
+        db = client[DB_NAME]
+        collection = db[COLLECTION_NAME]
+        # La carga se escribe en staging y al final reemplaza a la colección
+        # publicada con un rename, así los lectores nunca ven una carga a medias
+        staging = db[STAGING_COLLECTION]
+        pdet_collection = db[PDET_COLLECTION]
+        print(f"✓ Conectado a MongoDB")
+        print(f"  Base de datos: {DB_NAME}")
+        print(f"  Colección destino: {COLLECTION_NAME} (staging: {STAGING_COLLECTION})")
+        print(f"  Colección PDET: {PDET_COLLECTION}")
+    except Exception as e:
+        print(f"✗ ERROR: No se pudo conectar a MongoDB.")
+        print(f"  Detalle: {e}")
+        sys.exit(1)
+
+    # 2. Cargar municipios PDET en memoria
+    grilla_pdet = _cargar_indice_pdet(client, pdet_collection)
+
+    # 3. Verificar archivos y elegir el adaptador según el formato
+    lector = elegir_lector(entradas, RANGE_MB, GPKG_LAYER)
+    entradas = _verificar_entradas(client, entradas, lector)
+
+    # 4. Preparar la colección destino o reanudar desde el checkpoint
+    firma = firma_entrada(entradas)
+    estado = None
+    if args.resume:
+        estado = leer_checkpoint(CHECKPOINT_FILE)
+        if estado is None:
+            print(f"⚠ No hay checkpoint en {CHECKPOINT_FILE}: se inicia una carga completa")
+        elif estado.get('entrada') != firma or estado.get('incremental', False) != args.incremental:
+            print(f"✗ ERROR: El checkpoint {CHECKPOINT_FILE} corresponde a otra entrada o modo")
+            print(f"  Checkpoint: {estado.get('entrada')} (incremental: {estado.get('incremental', False)})")
+            _salir(client)
+        elif not args.incremental and staging.estimated_document_count() == 0:
+            print(f"⚠ La colección {STAGING_COLLECTION} está vacía: el checkpoint no sirve, "
+                  f"se inicia una carga completa")
+            estado = None
+    checkpoint = Checkpoint(CHECKPOINT_FILE, estado)
+    # Posición hasta la que la ejecución anterior pudo dejar documentos
+    # escritos sin confirmar (solo al reanudar una carga completa)
+    limite_upsert = None
+
+    # Identifica los documentos escritos en esta carga (para --prune). Un
+    # ObjectId no se repite aunque dos cargas arranquen en el mismo segundo;
+    # la hora legible queda en el manifiesto ('inicio')
+    CARGA_ID = estado['carga_id'] if estado else str(ObjectId())
+
+    if args.incremental:
+        # Upsert directo sobre la colección publicada, por hash de geometría
+        destino = collection
+        if collection.find_one({'geom_hash': {'$exists': False}}, {'_id': 1}):
+            print(f"✗ ERROR: {COLLECTION_NAME} tiene documentos sin 'geom_hash'")
+            print("  Ejecuta primero una carga completa (sin --incremental)")
+            _salir(client)
+        collection.create_index([("geom_hash", 1)], unique=True)
+        if estado:
+            print(f"✓ Reanudando carga incremental {CARGA_ID} (posición {estado['posicion']:,})")
+        else:
+            checkpoint.borrar()
+        print(f"✓ Modo incremental sobre {COLLECTION_NAME} ({collection.estimated_document_count():,} documentos)")
+    elif estado:
+        destino = staging
+        # Solo los lotes entre el checkpoint y lo que se llegó a enviar pueden
+        # estar escritos: esos van con upserts por geom_hash (los ids son
+        # deterministas) y el resto con insert_many, como una carga normal.
+        # Un checkpoint sin `enviado_hasta` (o con null) no dice hasta dónde: todo con upserts
+        limite_upsert = enviado_hasta(estado)
+        print(f"✓ Reanudando en {STAGING_COLLECTION} desde la posición {estado['posicion']:,} "
+              f"({staging.estimated_document_count():,} documentos ya escritos)")
+        if limite_upsert > estado['posicion']:
+            hasta = 'el final' if limite_upsert == SIN_LIMITE else f'la posición {limite_upsert:,}'
+            print(f"  Upserts por geom_hash hasta {hasta} (enviado sin confirmar); después, inserts")
+        else:
+            limite_upsert = None
+    else:
+        destino = staging
+        # Borrar la colección de staging es O(1), a diferencia de delete_many
+        staging.drop()
+        checkpoint.borrar()
+        estado = None
+        # Los índices que un documento puede violar se crean desde el inicio:
+        # una huella repetida o una geometría que el 2dsphere rechaza van al
+        # dead-letter en vez de impedir crear el índice al final
+        staging.create_index([("geom_hash", 1)], unique=True)
+        staging.create_index([("building_id", 1)], unique=True)
+        staging.create_index([("geometry", GEOSPHERE)])
+        print(f"✓ Colección {STAGING_COLLECTION} creada desde cero")
+
+    # 5. Procesar la entrada con filtro PDET
+    print("\n" + "="*60)
+    print("PROCESANDO FOOTPRINTS CON FILTRO PDET...")
+    print("="*60)
+
+    conteos = nuevos_conteos()
+    posicion_inicial = 0
+    if estado:
+        posicion_inicial = estado['posicion']
+        conteos.update(estado['conteos'])
+        grilla_pdet.estadisticas.update(estado['grilla'])
+
+    print(f"✓ BATCH_SIZE = {BATCH_SIZE}")
+    if ADAPTIVE_BATCH:
+        print(f"✓ Batch de inserción adaptativo: {BATCH_MIN}-{BATCH_MAX} docs, "
+              f"máx {BATCH_MAX_MB:g} MB, objetivo {INSERT_TARGET_MS:g} ms por insert")
+    print(f"✓ Workers = {args.workers}")
+    print(f"✓ Writers = {args.writers} (cola de {args.write_queue} batches)")
+    print("\nProcesando edificios...")
+
+    # Posición en la entrada al terminar cada lote (para los checkpoints)
+    posiciones = deque()
+
+    # Centroides + filtro PDET vectorizados por lote; con --workers > 1 el
+    # trabajo se reparte en un pool y los resultados vuelven en orden de entrada
+    resultados = lector.leer(entradas, posicion_inicial, posiciones, grilla_pdet, fuente.nombre,
+                             args.workers, BATCH_SIZE, {'carga_id': CARGA_ID})
+
+    # El lote de procesamiento sigue siendo BATCH_SIZE; el batch de inserción
+    # lo ajusta el controlador según bytes y latencia de insert_many
+    controlador = ControladorBatch(
+        inicial=BATCH_SIZE,
+        minimo=BATCH_MIN if ADAPTIVE_BATCH else BATCH_SIZE,
+        maximo=BATCH_MAX if ADAPTIVE_BATCH else BATCH_SIZE,
+        max_bytes=int(BATCH_MAX_MB * 1024 * 1024),
+        objetivo_seg=INSERT_TARGET_MS / 1000,
+    )
+    escritor = EscritorMongo(destino, args.writers, args.write_queue, controlador,
+                             reintentos=INSERT_RETRIES, espera_seg=RETRY_BACKOFF_S,
+                             dead_letter=DEAD_LETTER_FILE, checkpoint=checkpoint,
+                             upsert_por='geom_hash' if args.incremental else None,
+                             marcar_sin_cambios=args.prune)
+    emitidos = 0
+    posicion_anterior = posicion_inicial
+
+    # serverStatus y $collStats de la colección destino en segundo plano
+    monitor = None
+    if SERVER_STATS_INTERVAL_S > 0:
+        monitor = MonitorServidor(destino, SERVER_STATS_INTERVAL_S)
+        monitor.iniciar()
+
+    def registrar(resultado):
+        _registrar_carga(fuente, args, CARGA_ID, entradas, lector, inicio, resultado, conteos,
+                         grilla_pdet, escritor, controlador, monitor)
+
+    try:
+        for documentos, conteos_lote in resultados:
+            procesados_antes = conteos['procesados']
+            for k in conteos:
+                conteos[k] += conteos_lote[k]
+
+            posicion = posiciones.popleft()
+            upsert_por = None
+            if limite_upsert is not None:
+                if posicion_anterior < limite_upsert:
+                    upsert_por = 'geom_hash'
+                else:
+                    # Fin de la ventana sin confirmar: lo pendiente aún es de ella
+                    escritor.enviar(*controlador.vaciar(), upsert_por='geom_hash')
+                    limite_upsert = None
+            posicion_anterior = posicion
+            # Se anota antes de enviar: al reanudar, lo que esté después no se escribió
+            checkpoint.anunciar(posicion)
+
+            # Los documentos llegan ya codificados en BSON, con `carga_id`
+            for documento in documentos:
+                # Los batches se insertan en segundo plano mientras sigue el parseo
+                lleno = controlador.agregar(documento)
+                if lleno:
+                    escritor.enviar(*lleno, upsert_por=upsert_por)
+
+            # El checkpoint se guarda cuando todo lo emitido hasta aquí está escrito
+            emitidos += len(documentos)
+            checkpoint.registrar(emitidos, {
+                'entrada': firma,
+                'incremental': args.incremental,
+                'carga_id': CARGA_ID,
+                'posicion': posicion,
+                'conteos': dict(conteos),
+                'grilla': dict(grilla_pdet.estadisticas),
+            })
+
+            if conteos['procesados'] // 10000 > procesados_antes // 10000:
+                print(f"  Procesados: {conteos['procesados']:,} | En PDET: {conteos['filtrados_pdet']:,} | "
+                      f"Fuera: {conteos['fuera_pdet']:,}")
+
+        print(f"\n✓ Procesamiento completo")
+        print(f"  Total procesados: {conteos['procesados']:,}")
+        print(f"  En municipios PDET: {conteos['filtrados_pdet']:,}")
+        print(f"  Fuera de PDET: {conteos['fuera_pdet']:,}")
+        print(f"  Errores: {conteos['errores']:,}")
+        print(f"  Descartados sin parsear geometría: {conteos['descartados_rapido']:,}")
+        print(f"  Resueltos por grilla: {grilla_pdet.estadisticas['interior'] + grilla_pdet.estadisticas['rechazo']:,} | "
+              f"Prueba exacta (borde): {grilla_pdet.estadisticas['borde']:,}")
+
+        # Insertar batch restante y esperar a los escritores
+        escritor.enviar(*controlador.vaciar(),
+                        upsert_por='geom_hash' if limite_upsert is not None else None)
+        escritor.cerrar()
+    except ErrorEscritor as e:
+        # Un escritor murió: se detiene la carga en vez de esperar una cola
+        # que nadie vacía. El checkpoint quedó en el último lote confirmado
+        print(f"✗ ERROR en la escritura: {e}")
+        if not args.incremental:
+            print(f"  La colección {COLLECTION_NAME} no se modificó")
+        print(f"  El batch del error está en {DEAD_LETTER_FILE}; se puede reanudar con --resume")
+        registrar('error_escritura')
+        _salir(client)
+
+    _imprimir_etapas()
+    print(f"  ✓ Insertados (final): {escritor.insertados:,}")
+    if args.incremental:
+        print(f"  Huellas ya existentes: {escritor.actualizados:,} actualizadas, "
+              f"{escritor.sin_cambios:,} sin cambios (no se reescriben)")
+    if escritor.reintentados:
+        print(f"  ⚠ Documentos reintentados: {escritor.reintentados:,}")
+    if escritor.errores:
+        print(f"  ⚠ Documentos no insertados: {escritor.errores:,} (ver {DEAD_LETTER_FILE})")
+    r = controlador.resumen()
+    print(f"  Batches de inserción: {r['batches']:,} | Docs por batch: mín {r['min_docs']:,} / "
+          f"prom {r['prom_docs']:,.0f} / máx {r['max_docs']:,} | Tamaño final: {r['tamano_actual']:,}")
+    print(f"  MB por batch: prom {r['prom_mb']:.1f} / máx {r['max_mb']:.1f} | "
+          f"Latencia promedio de insert: {r['latencia_ms']:.0f} ms")
+
+    if destino.estimated_document_count() == 0:
+        print("✗ No se insertó ningún documento.")
+        print(f"  La colección {COLLECTION_NAME} no se modificó")
+        registrar('sin_documentos')
+        _salir(client)
+
+    # 6. Crear índices (en staging cada índice se construye una sola vez)
+    if not _crear_indices(destino):
+        if args.incremental:
+            print(f"  Los documentos ya están en {COLLECTION_NAME}, pero le faltan índices")
+        else:
+            print(f"✗ {COLLECTION_NAME} no se reemplaza: los datos nuevos quedan en {STAGING_COLLECTION}")
+        registrar('error_indices')
+        _salir(client)
+    if monitor:
+        # Antes de publicar: después del rename la colección de staging no existe
+        monitor.detener()
+        _imprimir_servidor(monitor.resumen())
+
+    # 7. Publicar: staging reemplaza a la colección anterior en una sola operación
+    print("\n" + "="*60)
+    print("PUBLICANDO COLECCIÓN...")
+    print("="*60)
+
+    if args.incremental:
+        # Los upserts ya quedaron en la colección publicada
+        if not args.prune:
+            print(f"✓ {COLLECTION_NAME} actualizada en modo incremental")
+        elif escritor.errores:
+            print(f"⚠ No se eliminan huellas desaparecidas: {escritor.errores:,} documentos no se escribieron")
+        else:
+            eliminados = collection.delete_many({'carga_id': {'$ne': CARGA_ID}}).deleted_count
+            print(f"✓ Huellas que ya no están en la entrada eliminadas: {eliminados:,}")
+    else:
+        try:
+            staging.rename(COLLECTION_NAME, dropTarget=True)
+            print(f"✓ {STAGING_COLLECTION} → {COLLECTION_NAME}")
+        except Exception as e:
+            print(f"✗ ERROR al reemplazar {COLLECTION_NAME}: {e}")
+            print(f"  Los datos nuevos quedan en {STAGING_COLLECTION}")
+            registrar('error_publicacion')
+            _salir(client)
+
+    # 8. Verificación final
+    _verificacion_final(collection)
+    registrar('ok')
+
+    print("\n" + "="*60)
+    print("✓ CARGA COMPLETADA - SOLO EDIFICIOS EN PDET")
+    print("="*60)
+
+    client.close()
+    checkpoint.borrar()
+
+    # Eliminar archivos para liberar espacio
+    for input_file in entradas:
+        if os.path.exists(input_file):
+            try:
+                os.remove(input_file)
+                print(f"🗑️  Archivo eliminado: {input_file}")
+            except Exception as e:
+                print(f"⚠️  No se pudo eliminar {input_file}: {e}")
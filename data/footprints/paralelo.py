@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modo paralelo de los cargadores (`--workers N`).
+
+Hay tres tipos de tarea:
+  - lotes de Features que el proceso principal ya leyó (FeatureCollection);
+  - lotes de filas de los CSV de Google (prefiltro lat/lon + WKT vectorizado);
+  - rangos de bytes de un archivo GeoJSONL, que cada worker lee por su
+    cuenta con mmap, de modo que también el parseo escala con los núcleos.
+
+Cada worker abre el mismo artefacto del índice PDET en disco (ver
+`footprints.cache_pdet`): la tabla de celdas se mapea en memoria y las
+páginas se comparten entre procesos. En una carga concurrente
+(`cargar_footprints.py`) abren en cambio el bloque de memoria compartida del
+orquestador (ver `footprints.memoria_compartida`). Si la grilla no viene de
+ninguno de los dos, el proceso principal le pasa el WKB de los municipios y
+el arreglo de celdas. En ningún caso se vuelve a consultar MongoDB.
+
+Los resultados se devuelven en el mismo orden de entrada (los checkpoints
+dependen de ese orden). Los `building_id` ya vienen calculados desde el
+worker a partir del hash de la geometría, y cada documento llega ya
+codificado en BSON (ver `footprints.columnar`): el proceso principal no
+reconstruye dicts ni vuelve a codificar antes de `insert_many`. Junto con
+cada resultado, el worker devuelve sus tiempos por etapa (ver
+`footprints.metricas`).
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from footprints.cache_pdet import cargar_artefacto
+from footprints.columnar import documentos_bson
+from footprints.memoria_compartida import abrir_grilla_compartida
+from footprints.metricas import METRICAS
+from footprints.perfilador import perfilar_worker
+from footprints.indice_pdet import IndiceMunicipios
+from footprints.grilla_pdet import GrillaMunicipios
+from footprints.geojsonl import iter_lineas
+from footprints.google_csv import procesar_filas_csv
+from footprints.procesamiento import iter_lotes, nuevos_conteos, procesar_lote, sumar_conteos
+
+# Estado por worker (se inicializa una vez por proceso)
+_grilla = None
+
+
+def _inicializar_worker(codigos, nombres, wkbs, celdas, origen_x, origen_y, tamano, clave):
+    global _grilla
+    indice = IndiceMunicipios.desde_wkb(codigos, nombres, wkbs)
+    _grilla = GrillaMunicipios(celdas, origen_x, origen_y, tamano, indice, clave=clave)
+    perfilar_worker()
+
+
+def _inicializar_worker_artefacto(ruta, clave):
+    global _grilla
+    _grilla = cargar_artefacto(ruta, clave)
+    perfilar_worker()
+
+
+def _inicializar_worker_compartida(nombre):
+    global _grilla
+    _grilla, _, _ = abrir_grilla_compartida(nombre)
+    perfilar_worker()
+
+
+def _procesar_lote(lote, fuente, extra):
+    columnar, conteos = procesar_lote(lote, _grilla, fuente)
+    return columnar.codificar(extra), conteos
+
+
+def _procesar_filas(filas, fuente, extra):
+    columnar, conteos = procesar_filas_csv(filas, _grilla, fuente)
+    return columnar.codificar(extra), conteos
+
+
+def _procesar_rango(path, inicio, fin, fuente, tamano_lote, extra):
+    crudos = []
+    conteos = nuevos_conteos()
+    for lote in METRICAS.medir_lotes(iter_lotes(iter_lineas(path, inicio, fin), tamano_lote)):
+        columnar, c = procesar_lote(lote, _grilla, fuente)
+        crudos.extend(columnar.codificar(extra))
+        sumar_conteos(conteos, c)
+    return crudos, conteos
+
+
+def _ejecutar_en_worker(funcion, args):
+    for k in _grilla.estadisticas:
+        _grilla.estadisticas[k] = 0
+    METRICAS.reiniciar()
+    resultado = funcion(*args)
+    return resultado, dict(_grilla.estadisticas), METRICAS.instantanea()
+
+
+def _mapear_en_orden(funcion, tareas, grilla_pdet, workers, en_vuelo):
+    """Aplica `funcion(*args)` a cada tarea y entrega los resultados en orden.
+
+    Con workers <= 1 se ejecuta en el mismo proceso. Con más workers se
+    mantienen como máximo `en_vuelo` tareas pendientes (por defecto 2 por
+    worker) para acotar la memoria mientras el lector sigue avanzando.
+    """
+    global _grilla
+    if workers <= 1:
+        _grilla = grilla_pdet
+        for args in tareas:
+            yield _a_documentos(funcion(*args))
+        return
+
+    en_vuelo = en_vuelo or 2 * workers
+    if grilla_pdet.memoria_compartida:
+        inicializar = _inicializar_worker_compartida
+        initargs = (grilla_pdet.memoria_compartida,)
+    elif grilla_pdet.ruta_artefacto:
+        inicializar = _inicializar_worker_artefacto
+        initargs = (grilla_pdet.ruta_artefacto, grilla_pdet.clave)
+    else:
+        inicializar = _inicializar_worker
+        codigos, nombres, wkbs = grilla_pdet.indice_pdet.a_wkb()
+        initargs = (codigos, nombres, wkbs, grilla_pdet.celdas, grilla_pdet.origen_x,
+                    grilla_pdet.origen_y, grilla_pdet.tamano, grilla_pdet.clave)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=inicializar,
+                             initargs=initargs) as pool:
+        pendientes = deque()
+        for args in tareas:
+            pendientes.append(pool.submit(_ejecutar_en_worker, funcion, args))
+            METRICAS.muestrear_cola('tareas_en_vuelo', len(pendientes))
+            if len(pendientes) >= en_vuelo:
+                yield _a_documentos(_recibir(pendientes.popleft(), grilla_pdet))
+        while pendientes:
+            yield _a_documentos(_recibir(pendientes.popleft(), grilla_pdet))
+
+
+def _a_documentos(resultado):
+    crudos, conteos = resultado
+    return documentos_bson(crudos), conteos
+
+
+def _recibir(futuro, grilla_pdet):
+    resultado, estadisticas, metricas = futuro.result()
+    # Acumular en la grilla y las métricas del proceso principal para el
+    # resumen final y el manifiesto
+    for k, v in estadisticas.items():
+        grilla_pdet.estadisticas[k] += v
+    METRICAS.combinar(metricas)
+    return resultado
+
+
+def procesar_lotes(lotes, grilla_pdet, fuente, workers=1, en_vuelo=None, extra=None):
+    """Generador de (documentos, conteos) para cada lote, en orden de entrada.
+
+    Los documentos son RawBSONDocument; `extra` son campos fijos que se
+    agregan a todos (p. ej. `carga_id`).
+    """
+    tareas = ((lote, fuente, extra) for lote in lotes)
+    return _mapear_en_orden(_procesar_lote, tareas, grilla_pdet, workers, en_vuelo)
+
+
+def procesar_filas(lotes_filas, grilla_pdet, fuente, workers=1, en_vuelo=None, extra=None):
+    """Generador de (documentos, conteos) para cada lote de filas CSV de
+    Google, en orden de entrada."""
+    tareas = ((filas, fuente, extra) for filas in lotes_filas)
+    return _mapear_en_orden(_procesar_filas, tareas, grilla_pdet, workers, en_vuelo)
+
+
+def procesar_rangos(path, rangos, grilla_pdet, fuente, workers=1, tamano_lote=5000, en_vuelo=None,
+                    extra=None):
+    """Generador de (documentos, conteos) para cada rango de un GeoJSONL,
+    en orden de entrada. Los workers leen y parsean su rango directamente."""
+    tareas = ((path, inicio, fin, fuente, tamano_lote, extra) for inicio, fin in rangos)
+    return _mapear_en_orden(_procesar_rango, tareas, grilla_pdet, workers, en_vuelo)
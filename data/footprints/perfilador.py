@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfilado opcional de los scripts de carga (`ETL_PROFILE`).
+
+Cada punto de entrada (`cargar_*.py`, `eda_footprints.py`,
+`scripts/fix_invalid_geometries.py`) llama a `perfilar(nombre)` al empezar.
+Sin `ETL_PROFILE` no hace nada. Con él:
+
+  muestreo      un hilo toma la pila de todos los hilos cada
+                `ETL_PROFILE_INTERVAL_MS` (default 5) con
+                `sys._current_frames()`. Es un perfil de tiempo de pared:
+                incluye la espera de E/S y de la cola de escritura. Solo
+                muestrea dentro de la ventana `ETL_PROFILE_START_S` /
+                `ETL_PROFILE_DURATION_S` (default: toda la ejecución).
+                Escribe las pilas en formato collapsed (`.collapsed`), que
+                abren speedscope y flamegraph.pl. Los hilos bloqueados (cola
+                de escritura, pool, join) se descartan salvo con
+                `ETL_PROFILE_IDLE=1`.
+  determinista  cProfile sobre el hilo principal, dentro de la misma
+                ventana; escribe un `.pstats` (snakeviz, pstats) y un
+                `.collapsed` armado con el grafo de llamadas, en
+                microsegundos. cProfile solo guarda pares llamador-llamado,
+                así que el tiempo de cada función se reparte entre las pilas
+                que la llaman en proporción a lo que aportó cada llamador;
+                una recursión corta la rama. cProfile
+                solo perfila el hilo que lo activa, así que la ventana se
+                abre y se cierra con SIGALRM, cuyo manejador corre en el
+                hilo principal. Las funciones que ya estaban en curso al
+                abrirla (el bucle de la carga) no aparecen; sí todo lo que
+                llaman desde ahí.
+
+En ambos casos se escribe además un `.txt` con las `ETL_PROFILE_TOP`
+funciones más costosas (default 20), en `ETL_PROFILE_DIR` (default
+`perfiles`). Los workers de `--workers` se perfilan igual, cada uno en su
+propio archivo `<nombre>_w<pid>`, con la ventana contada desde su inicio.
+"""
+import os
+import io
+import sys
+import time
+import atexit
+import pstats
+import signal
+import cProfile
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from multiprocessing import util
+
+MODOS = ('muestreo', 'determinista')
+
+# Funciones en las que un hilo está esperando, no trabajando (hoja de la pila)
+ESPERAS = {
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'), ('connection.py', '_recv'), ('connection.py', '_poll'),
+}
+
+_perfil = None
+
+
+def _configuracion():
+    modo = os.getenv('ETL_PROFILE', '').strip().lower()
+    if not modo or modo in ('0', 'no'):
+        return None
+    if modo not in MODOS:
+        print(f"⚠ ETL_PROFILE='{modo}' no reconocido (usar {' o '.join(MODOS)}); sin perfilado")
+        return None
+    return {
+        'modo': modo,
+        'directorio': os.getenv('ETL_PROFILE_DIR', 'perfiles'),
+        'intervalo_s': float(os.getenv('ETL_PROFILE_INTERVAL_MS', '5')) / 1000,
+        'inicio_s': float(os.getenv('ETL_PROFILE_START_S', '0')),
+        'duracion_s': float(os.getenv('ETL_PROFILE_DURATION_S', '0')),
+        'top': int(os.getenv('ETL_PROFILE_TOP', '20')),
+        'inactivos': os.getenv('ETL_PROFILE_IDLE', '0') == '1',
+    }
+
+
+def _funcion(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _funcion_pstats(func):
+    archivo, linea, nombre = func
+    if archivo == '~':
+        # Built-ins: "<built-in method ...>", "<method ... of ... objects>"
+        return nombre
+    return f"{nombre} ({os.path.basename(archivo)}:{linea})"
+
+
+def _pilas_cprofile(stats, raiz, minimo_us=1):
+    """Pilas collapsed (de raíz a hoja) con microsegundos de tiempo propio,
+    a partir de `pstats.Stats.stats`."""
+    llamados = defaultdict(dict)
+    for func, (_, _, _, _, llamadores) in stats.items():
+        for llamador, arista in llamadores.items():
+            llamados[llamador][func] = arista[3]
+    pilas = Counter()
+
+    def visitar(func, segundos, pila, en_pila):
+        pila = pila + [_funcion_pstats(func)]
+        total = stats[func][3]
+        factor = segundos / total if total else 0
+        # Con recursión el acumulado de las aristas puede pasar del total
+        aristas = sum(llamados.get(func, {}).values())
+        if aristas * factor > segundos:
+            factor = segundos / aristas
+        hijos = 0.0
+        for hijo, acumulado in llamados.get(func, {}).items():
+            parte = acumulado * factor
+            if hijo in en_pila or parte * 1e6 < minimo_us:
+                continue
+            hijos += parte
+            visitar(hijo, parte, pila, en_pila | {hijo})
+        propio = round((segundos - hijos) * 1e6)
+        if propio >= minimo_us:
+            pilas[';'.join(pila)] += propio
+
+    for func, (_, _, _, acumulado, llamadores) in stats.items():
+        if not llamadores:
+            visitar(func, acumulado, [raiz], {func})
+    return pilas
+
+
+def _escribir_collapsed(ruta, pilas):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for pila, cuenta in sorted(pilas.items()):
+            f.write(f'{pila} {cuenta}\n')
+
+
+class Muestreador(threading.Thread):
+    """Cuenta las pilas (de raíz a hoja) de los demás hilos del proceso."""
+
+    def __init__(self, intervalo_s, inicio_s=0, duracion_s=0, inactivos=False):
+        super().__init__(name='perfilador', daemon=True)
+        self.intervalo_s = intervalo_s
+        self.inicio_s = inicio_s
+        self.duracion_s = duracion_s
+        self.inactivos = inactivos
+        self.pilas = Counter()
+        self.muestras = 0
+        self.segundos = 0.0
+        self._parar = threading.Event()
+
+    def run(self):
+        if self.inicio_s and self._parar.wait(self.inicio_s):
+            return
+        inicio = time.monotonic()
+        propio = threading.get_ident()
+        while not self._parar.wait(self.intervalo_s):
+            self.segundos = time.monotonic() - inicio
+            if self.duracion_s and self.segundos >= self.duracion_s:
+                break
+            nombres = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                code = frame.f_code
+                if not self.inactivos and (os.path.basename(code.co_filename), code.co_name) in ESPERAS:
+                    continue
+                pila = []
+                while frame is not None:
+                    pila.append(_funcion(frame.f_code))
+                    frame = frame.f_back
+                pila.append(nombres.get(ident, f'hilo-{ident}'))
+                self.pilas[';'.join(reversed(pila))] += 1
+            self.muestras += 1
+
+    def detener(self):
+        self._parar.set()
+        self.join(timeout=5)
+
+    def resumen(self, top=20):
+        """Top de funciones por muestras propias (hoja) y totales."""
+        propias = Counter()
+        totales = Counter()
+        total = sum(self.pilas.values())
+        n = total or 1
+        for pila, cuenta in self.pilas.items():
+            marcos = pila.split(';')[1:]
+            if not marcos:
+                continue
+            propias[marcos[-1]] += cuenta
+            for marco in set(marcos):
+                totales[marco] += cuenta
+        lineas = [f"Perfil por muestreo: {self.muestras:,} muestras cada {self.intervalo_s * 1000:g} ms "
+                  f"({self.segundos:.1f} s, {total:,} pilas de todos los hilos)",
+                  f"{'% propio':>9} {'% total':>8}  función"]
+        for marco, cuenta in propias.most_common(top):
+            lineas.append(f"{100 * cuenta / n:8.1f}% {100 * totales[marco] / n:7.1f}%  {marco}")
+        return '\n'.join(lineas)
+
+
+class Perfil:
+    def __init__(self, nombre, config):
+        self.nombre = nombre
+        self.config = config
+        self.muestreador = None
+        self.perfilador = None
+        # Ventana del modo determinista: 'espera' -> 'activo' -> 'cerrado'
+        self.ventana = None
+
+    def iniciar(self):
+        if self.config['modo'] == 'muestreo':
+            self.muestreador = Muestreador(self.config['intervalo_s'], self.config['inicio_s'],
+                                           self.config['duracion_s'], self.config['inactivos'])
+            self.muestreador.start()
+            return
+        self.perfilador = cProfile.Profile()
+        inicio_s, duracion_s = self.config['inicio_s'], self.config['duracion_s']
+        if (inicio_s or duracion_s) and threading.current_thread() is not threading.main_thread():
+            print("⚠ ETL_PROFILE_START_S/ETL_PROFILE_DURATION_S solo aplican desde el hilo principal; "
+                  "se perfila toda la ejecución")
+            inicio_s = duracion_s = 0
+        if inicio_s or duracion_s:
+            signal.signal(signal.SIGALRM, self._alarma)
+        if inicio_s:
+            self.ventana = 'espera'
+            signal.setitimer(signal.ITIMER_REAL, inicio_s)
+        else:
+            self._abrir()
+
+    def _abrir(self):
+        self.perfilador.enable()
+        self.ventana = 'activo'
+        if self.config['duracion_s']:
+            signal.setitimer(signal.ITIMER_REAL, self.config['duracion_s'])
+
+    def _alarma(self, signum, frame):
+        if self.ventana == 'espera':
+            self._abrir()
+        elif self.ventana == 'activo':
+            self.perfilador.disable()
+            self.ventana = 'cerrado'
+
+    def terminar(self):
+        base = os.path.join(self.config['directorio'], self.nombre)
+        try:
+            os.makedirs(self.config['directorio'], exist_ok=True)
+            if self.muestreador is not None:
+                self.muestreador.detener()
+                _escribir_collapsed(f'{base}.collapsed', self.muestreador.pilas)
+                resumen = self.muestreador.resumen(self.config['top'])
+                archivos = f'{base}.collapsed'
+            else:
+                if self.config['inicio_s'] or self.config['duracion_s']:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+                if self.ventana == 'espera':
+                    print(f"⚠ La ejecución terminó antes de ETL_PROFILE_START_S; sin perfil {base}")
+                    return
+                self.perfilador.disable()
+                self.perfilador.dump_stats(f'{base}.pstats')
+                salida = io.StringIO()
+                stats = pstats.Stats(self.perfilador, stream=salida)
+                _escribir_collapsed(f'{base}.collapsed',
+                                    _pilas_cprofile(stats.stats, threading.main_thread().name))
+                stats.sort_stats('tottime').print_stats(self.config['top'])
+                resumen = salida.getvalue()
+                archivos = f'{base}.pstats, {base}.collapsed'
+            with open(f'{base}.txt', 'w', encoding='utf-8') as f:
+                f.write(resumen + '\n')
+            print(f"✓ Perfil ({self.config['modo']}): {archivos} | resumen: {base}.txt")
+        except Exception as e:
+            print(f"⚠ No se pudo escribir el perfil {base}: {e}")
+
+
+def perfilar(nombre):
+    """Activa el perfilado del proceso si `ETL_PROFILE` está definido; los
+    archivos se escriben al salir. Devuelve el Perfil o None."""
+    global _perfil
+    config = _configuracion()
+    if config is None or _perfil is not None:
+        return _perfil
+    nombre = f"{nombre}_{datetime.now():%Y%m%dT%H%M%S}"
+    # Los workers del pool heredan el nombre para sus propios archivos
+    os.environ['ETL_PROFILE_NOMBRE'] = nombre
+    _perfil = Perfil(nombre, config)
+    _perfil.iniciar()
+    atexit.register(_perfil.terminar)
+    print(f"⏱️  Perfilado activo ({config['modo']}) → {config['directorio']}/{nombre}.*")
+    return _perfil
+
+
+def perfilar_worker():
+    """Perfilado de un worker del pool, si el proceso principal lo activó.
+
+    Los workers de multiprocessing terminan sin pasar por atexit, así que
+    el perfil se escribe con un finalizador de multiprocessing.
+    """
+    global _perfil
+    config = _configuracion()
+    nombre = os.getenv('ETL_PROFILE_NOMBRE')
+    if config is None or not nombre:
+        return
+    if _perfil is not None:
+        # Proceso creado con fork desde uno que ya se perfilaba: se descarta
+        # lo heredado y se empieza de cero
+        if _perfil.perfilador is not None:
+            _perfil.perfilador.disable()
+    _perfil = Perfil(f'{nombre}_w{os.getpid()}', config)
+    _perfil.iniciar()
+    util.Finalize(None, _perfil.terminar, exitpriority=10)
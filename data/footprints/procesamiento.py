@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Procesamiento por lotes de footprints: centroides, filtro PDET y armado de
+documentos.
+
+En vez de ir feature por feature (`shape()` → `.centroid` → `Point` →
+`contains`), se construyen las geometrías de todo el lote, se calculan los
+centroides con las funciones vectorizadas de Shapely 2 y se asigna el
+`codigo_municipio` de todo el lote en una sola consulta al índice PDET.
+
+Los Features que llegan como bytes crudos pasan antes por un descarte
+barato: se toma el primer par de coordenadas con una expresión regular y,
+si está a más de una celda de la grilla de cualquier municipio PDET, el
+Feature se cuenta como fuera de PDET sin llegar a `json.loads`.
+
+El resultado de cada lote es un `LoteColumnar` (ver `footprints.columnar`):
+las geometrías se construyen desde buffers planos y los documentos se
+arman recién al codificarlos a BSON.
+"""
+import re
+import json
+import hashlib
+
+import numpy as np
+import shapely
+
+from footprints.columnar import LoteColumnar, geometrias_desde_geojson
+from footprints.geometria import areas_perimetros, normalizar_geometrias
+from footprints.metricas import METRICAS
+
+
+def iter_lotes(iterable, tamano):
+    """Agrupa un iterable en listas de hasta `tamano` elementos."""
+    lote = []
+    for item in iterable:
+        lote.append(item)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+# Primer par lon/lat del arreglo "coordinates" (cualquier nivel de anidamiento)
+_PRIMERA_COORDENADA = re.compile(
+    rb'"coordinates"\s*:\s*\[[\s\[]*(-?[0-9][0-9.eE+-]*)\s*,\s*(-?[0-9][0-9.eE+-]*)')
+
+
+def primeras_coordenadas(crudos):
+    """(xs, ys) del primer vértice de cada Feature crudo; NaN si no se ubica.
+
+    Las líneas que traen un FeatureCollection completo quedan en NaN para
+    que nunca se descarten de forma anticipada.
+    """
+    xs = np.full(len(crudos), np.nan)
+    ys = np.full(len(crudos), np.nan)
+    for i, raw in enumerate(crudos):
+        if b'"features"' in raw:
+            continue
+        m = _PRIMERA_COORDENADA.search(raw)
+        if m is None:
+            continue
+        try:
+            xs[i] = float(m.group(1))
+            ys[i] = float(m.group(2))
+        except ValueError:
+            pass
+    return xs, ys
+
+
+def descartar_lejanos(features, grilla_pdet):
+    """Separa los Features crudos cuyo primer vértice está lejos de PDET.
+
+    Devuelve (restantes, n_descartados). Supone que cada footprint mide
+    menos de una celda de la grilla (~1 km con 0.01°), de modo que su
+    centroide cae en la celda del primer vértice o en una vecina.
+    """
+    crudos = [i for i, f in enumerate(features) if isinstance(f, bytes)]
+    if not crudos:
+        return features, 0
+    xs, ys = primeras_coordenadas([features[i] for i in crudos])
+    lejos = grilla_pdet.lejanos(xs, ys)
+    if not lejos.any():
+        return features, 0
+    fuera = {crudos[i] for i in np.flatnonzero(lejos)}
+    return [f for i, f in enumerate(features) if i not in fuera], len(fuera)
+
+
+def decodificar_features(features):
+    """Decodifica los Features crudos (bytes/str JSON) de un lote.
+
+    Los dict se dejan como están. Una línea GeoJSONL que trae un
+    FeatureCollection completo se expande en sus Features, como hacía
+    `convert_geojsonl_to_geojson.py`. Lo que no es JSON válido sale como None.
+    """
+    for feature in features:
+        if isinstance(feature, (bytes, str)):
+            try:
+                feature = json.loads(feature)
+            except Exception:
+                yield None
+                continue
+        if isinstance(feature, dict) and isinstance(feature.get('features'), list):
+            yield from feature['features']
+        else:
+            yield feature
+
+
+def extraer_geometria(feature):
+    """Devuelve (geometry, properties) de un Feature GeoJSON o de una
+    geometría suelta; geometry es None si no se reconoce el objeto."""
+    if isinstance(feature, dict) and feature.get('geometry'):
+        return feature['geometry'], feature.get('properties', {}) or {}
+    if isinstance(feature, dict) and feature.get('type') and feature.get('coordinates'):
+        return {'type': feature.get('type'), 'coordinates': feature.get('coordinates')}, {}
+    return None, {}
+
+
+DECIMALES_HASH = 7
+
+# Prefijo de building_id por fuente
+PREFIJOS_ID = {'Google': 'G-Bldg', 'Microsoft': 'MS-Bldg'}
+
+
+def building_id(fuente, geom_hash):
+    """`<prefijo>-<16 hex>`: 64 bits del hash de la geometría. Lo puede
+    calcular cualquier worker sin coordinarse con los demás."""
+    return f"{PREFIJOS_ID.get(fuente, fuente + '-Bldg')}-{geom_hash[:16]}"
+
+
+def hash_geometrias(geoms):
+    """Hash estable (hex de 32 caracteres) de cada geometría normalizada.
+
+    Se calcula sobre el WKB 2D little-endian de `shapely.normalize`, que fija
+    el orden de anillos y el vértice inicial, con las coordenadas
+    cuantizadas a 1e-7 grados (~1 cm) para que diferencias de redondeo entre
+    fuentes o versiones no cambien el hash. La misma huella da el mismo hash
+    en todas las cargas, aunque cambien sus propiedades o el orden del
+    archivo.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    cuantizadas = shapely.transform(geoms, lambda c: np.round(c, DECIMALES_HASH))
+    wkbs = shapely.to_wkb(shapely.normalize(cuantizadas),
+                          output_dimension=2, byte_order=1, include_srid=False)
+    return [hashlib.blake2b(w, digest_size=16).hexdigest() for w in wkbs]
+
+
+def nuevos_conteos():
+    # descartados_rapido: parte de fuera_pdet resuelta sin construir la geometría
+    return {'procesados': 0, 'filtrados_pdet': 0, 'fuera_pdet': 0, 'errores': 0,
+            'descartados_rapido': 0}
+
+
+def sumar_conteos(total, parcial):
+    for k, v in parcial.items():
+        total[k] = total.get(k, 0) + v
+    return total
+
+
+def procesar_lote(features, indice_pdet, fuente):
+    """Filtra un lote de features (dict o JSON crudo) contra PDET y arma los
+    documentos.
+
+    Devuelve (LoteColumnar, conteos). Cada documento lleva `geom_hash` y un
+    `building_id` derivado de él, así que no depende del orden de entrada.
+    `conteos` tiene las claves procesados, filtrados_pdet, fuera_pdet y errores.
+    """
+    conteos = nuevos_conteos()
+
+    # Descarte previo a json.loads (solo cuando se filtra con la grilla)
+    if hasattr(indice_pdet, 'lejanos'):
+        with METRICAS.etapa('prefiltro', len(features)):
+            features, descartados = descartar_lejanos(features, indice_pdet)
+        conteos['procesados'] += descartados
+        conteos['fuera_pdet'] += descartados
+        conteos['descartados_rapido'] += descartados
+
+    propiedades = []
+    geometrias = []
+    with METRICAS.etapa('decodificacion_json', len(features)):
+        for feature in decodificar_features(features):
+            conteos['procesados'] += 1
+            geometry, properties = extraer_geometria(feature)
+            if geometry is None:
+                conteos['errores'] += 1
+                continue
+            geometrias.append(geometry)
+            propiedades.append(properties)
+
+    # Geometrías del lote completo desde buffers de coordenadas
+    with METRICAS.etapa('construccion_geometrias', len(geometrias)):
+        shapes = geometrias_desde_geojson(geometrias)
+    construidas = ~shapely.is_missing(shapes)
+    conteos['errores'] += int((~construidas).sum())
+    if not construidas.all():
+        shapes = shapes[construidas]
+        propiedades = [p for p, ok in zip(propiedades, construidas) if ok]
+
+    lote, c = procesar_geometrias(shapes, propiedades, indice_pdet, fuente)
+    return lote, sumar_conteos(conteos, c)
+
+
+def procesar_geometrias(shapes, propiedades, indice_pdet, fuente):
+    """Asigna municipio, normaliza y mide las geometrías Shapely ya
+    construidas de un lote. Devuelve (LoteColumnar, conteos) sin contar
+    `procesados`."""
+    conteos = nuevos_conteos()
+    if not len(shapes):
+        return LoteColumnar(fuente), conteos
+
+    # Centroides y asignación de municipio para todo el lote
+    geoms = np.asarray(shapes, dtype=object)
+    with METRICAS.etapa('centroide', len(geoms)):
+        centroides = shapely.centroid(geoms)
+    with METRICAS.etapa('busqueda_pdet', len(geoms)):
+        codigos = indice_pdet.buscar_lote(shapely.get_x(centroides), shapely.get_y(centroides))
+
+    dentro = np.array([c is not None for c in codigos], dtype=bool)
+    conteos['fuera_pdet'] += int((~dentro).sum())
+    conteos['filtrados_pdet'] += int(dentro.sum())
+    indices = np.flatnonzero(dentro)
+    if not len(indices):
+        return LoteColumnar(fuente), conteos
+
+    # Reparación y orientación del lote completo: solo las inválidas pasan
+    # por make_valid
+    with METRICAS.etapa('normalizacion', len(indices)):
+        normalizadas = normalizar_geometrias(geoms[indices])
+    utiles = ~shapely.is_missing(normalizadas) & ~shapely.is_empty(normalizadas)
+    conteos['errores'] += int((~utiles).sum())
+    indices = indices[utiles]
+    normalizadas = normalizadas[utiles]
+
+    with METRICAS.etapa('centroide', len(normalizadas)):
+        centroides_n = shapely.centroid(normalizadas)
+
+    # Área y perímetro en metros (proyección EPSG:9377 de todo el lote)
+    with METRICAS.etapa('area_perimetro', len(normalizadas)):
+        areas_m2, perimetros_m = areas_perimetros(normalizadas)
+
+    with METRICAS.etapa('hash_geometria', len(normalizadas)):
+        hashes = hash_geometrias(normalizadas)
+    lote = LoteColumnar(
+        fuente, normalizadas,
+        codigos=[codigos[i] for i in indices],
+        propiedades=[propiedades[i] for i in indices],
+        building_ids=[building_id(fuente, h) for h in hashes],
+        hashes=hashes,
+        centroides_x=shapely.get_x(centroides_n),
+        centroides_y=shapely.get_y(centroides_n),
+        areas=areas_m2,
+        perimetros=perimetros_m,
+    )
+    return lote, conteos
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas del servidor MongoDB durante una carga.
+
+Los tiempos del cliente (`footprints.metricas`) no dicen si el límite está en
+la caché de WiredTiger, en los fsync del journal, en el mantenimiento de
+índices o en la espera por locks. `MonitorServidor` es un hilo que, cada
+`intervalo_s`, toma `serverStatus` y `$collStats` de la colección destino y
+guarda la primera muestra, la última y los máximos. Al detenerlo, `resumen()`
+entrega para el manifiesto:
+
+  - contadores (inserts, fsync del journal, checkpoints, evicciones, ...):
+    diferencia entre la primera y la última muestra, y por segundo;
+  - medidas (bytes sucios en caché, colas de locks, ...): inicial, final y
+    máximo observado;
+  - colección: tamaño, almacenamiento y tamaño de cada índice al inicio, en
+    la última muestra y al final, con el máximo observado de cada uno (así
+    se ve crecer el 2dsphere mientras se inserta, no solo al terminar).
+
+Los nombres de las estadísticas de WiredTiger cambian entre versiones de
+MongoDB, así que cada métrica prueba varias rutas y se omite si no aparece
+ninguna. Si el servidor no permite `serverStatus` (permisos, mongomock) el
+monitor se desactiva con un aviso y la carga sigue igual.
+"""
+import time
+import threading
+
+# nombre -> rutas posibles dentro de serverStatus (la primera que exista)
+CONTADORES = {
+    'inserts': [('opcounters', 'insert')],
+    'updates': [('opcounters', 'update')],
+    'documentos_insertados': [('metrics', 'document', 'inserted')],
+    'journal_fsync': [('wiredTiger', 'log', 'log sync operations')],
+    'journal_fsync_us': [('wiredTiger', 'log', 'log sync time duration (usecs)')],
+    'journal_bytes': [('wiredTiger', 'log', 'log bytes written')],
+    'checkpoints': [('wiredTiger', 'transaction', 'transaction checkpoints'),
+                    ('wiredTiger', 'checkpoint', 'number of checkpoints started')],
+    'checkpoint_total_ms': [('wiredTiger', 'transaction', 'transaction checkpoint total time (msecs)'),
+                            ('wiredTiger', 'checkpoint', 'total time (msecs)')],
+    'cache_paginas_leidas': [('wiredTiger', 'cache', 'pages read into cache')],
+    'cache_paginas_escritas': [('wiredTiger', 'cache', 'pages written from cache')],
+    'cache_evicciones_modificadas': [('wiredTiger', 'cache', 'modified pages evicted')],
+    'cache_evicciones_por_aplicacion': [('wiredTiger', 'cache', 'pages evicted by application threads')],
+}
+MEDIDAS = {
+    'cache_bytes': [('wiredTiger', 'cache', 'bytes currently in the cache')],
+    'cache_bytes_sucios': [('wiredTiger', 'cache', 'tracked dirty bytes in the cache')],
+    'cache_maximo_bytes': [('wiredTiger', 'cache', 'maximum bytes configured')],
+    'checkpoint_ultimo_ms': [('wiredTiger', 'transaction', 'transaction checkpoint most recent time (msecs)'),
+                             ('wiredTiger', 'checkpoint', 'most recent time (msecs)')],
+    'cola_locks_escritura': [('globalLock', 'currentQueue', 'writers')],
+    'cola_locks_total': [('globalLock', 'currentQueue', 'total')],
+    'tickets_escritura_disponibles': [('wiredTiger', 'concurrentTransactions', 'write', 'available'),
+                                      ('queues', 'execution', 'write', 'available')],
+}
+
+
+def _valor(documento, rutas):
+    for ruta in rutas:
+        valor = documento
+        for clave in ruta:
+            if not isinstance(valor, dict) or clave not in valor:
+                break
+            valor = valor[clave]
+        else:
+            if isinstance(valor, (int, float)):
+                return valor
+    return None
+
+
+def _estado_servidor(admin):
+    estado = admin.command('serverStatus')
+    valores = {nombre: _valor(estado, rutas) for nombre, rutas in {**CONTADORES, **MEDIDAS}.items()}
+    return {nombre: valor for nombre, valor in valores.items() if valor is not None}
+
+
+def _estado_coleccion(collection):
+    """Tamaños de la colección según $collStats (`collStats` está obsoleto
+    desde MongoDB 6.2)."""
+    stats = next(collection.aggregate([{'$collStats': {'storageStats': {}}}]), {})
+    storage = stats.get('storageStats', {})
+    return {
+        'documentos': storage.get('count', 0),
+        'bytes': storage.get('size', 0),
+        'almacenamiento_bytes': storage.get('storageSize', 0),
+        'indices_bytes': storage.get('totalIndexSize', 0),
+        'indices': dict(storage.get('indexSizes', {})),
+    }
+
+
+class MonitorServidor(threading.Thread):
+    """Muestrea serverStatus y $collStats de `collection` en segundo plano."""
+
+    def __init__(self, collection, intervalo_s=5):
+        super().__init__(name='monitor-servidor', daemon=True)
+        self.collection = collection
+        self.admin = collection.database.client.admin
+        self.intervalo_s = intervalo_s
+        self.muestras = 0
+        self.primera = None
+        self.ultima = None
+        self.maximos = {}
+        self.coleccion_inicial = None
+        self.coleccion_ultima = None
+        self.coleccion_final = None
+        self.coleccion_maximos = {}
+        self.muestras_coleccion = 0
+        self.error = None
+        self._t0 = self._t1 = None
+        self._parar = threading.Event()
+
+    def _muestrear(self):
+        estado = _estado_servidor(self.admin)
+        ahora = time.monotonic()
+        if self.primera is None:
+            self.primera, self._t0 = estado, ahora
+        self.ultima, self._t1 = estado, ahora
+        for nombre in MEDIDAS:
+            if nombre in estado:
+                self.maximos[nombre] = max(self.maximos.get(nombre, estado[nombre]), estado[nombre])
+        self.muestras += 1
+
+    def _muestrear_coleccion(self):
+        try:
+            estado = _estado_coleccion(self.collection)
+        except Exception:
+            # La colección de staging puede no existir todavía
+            return None
+        self.coleccion_ultima = estado
+        for clave in ('documentos', 'bytes', 'almacenamiento_bytes', 'indices_bytes'):
+            self.coleccion_maximos[clave] = max(self.coleccion_maximos.get(clave, 0), estado[clave])
+        indices = self.coleccion_maximos.setdefault('indices', {})
+        for nombre, tamano in estado['indices'].items():
+            indices[nombre] = max(indices.get(nombre, 0), tamano)
+        self.muestras_coleccion += 1
+        return estado
+
+    def iniciar(self):
+        """Toma la primera muestra y arranca el hilo; False si el servidor
+        no entrega serverStatus."""
+        try:
+            self._muestrear()
+        except Exception as e:
+            self.error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            print(f"⚠ Sin métricas del servidor (serverStatus no disponible: {self.error})")
+            return False
+        self.coleccion_inicial = self._muestrear_coleccion()
+        self.start()
+        return True
+
+    def run(self):
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                self._muestrear()
+            except Exception as e:
+                self.error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            self._muestrear_coleccion()
+
+    def detener(self):
+        """Detiene el hilo con una última muestra. Se puede llamar más de una vez."""
+        if self.primera is None or self._parar.is_set():
+            return
+        self._parar.set()
+        self.join(timeout=self.intervalo_s + 5)
+        try:
+            self._muestrear()
+        except Exception as e:
+            self.error = str(e).splitlines()[0] if str(e) else type(e).__name__
+        self.coleccion_final = self._muestrear_coleccion()
+
+    def resumen(self):
+        if self.primera is None:
+            return {'disponible': False, 'error': self.error}
+        segundos = self._t1 - self._t0
+        contadores = {}
+        for nombre in CONTADORES:
+            if nombre in self.primera and nombre in self.ultima:
+                delta = self.ultima[nombre] - self.primera[nombre]
+                contadores[nombre] = {'delta': delta,
+                                      'por_s': round(delta / segundos, 1) if segundos > 0 else None}
+        medidas = {
+            nombre: {'inicial': self.primera[nombre], 'final': self.ultima.get(nombre),
+                     'max': self.maximos.get(nombre)}
+            for nombre in MEDIDAS if nombre in self.primera
+        }
+        coleccion = {'nombre': self.collection.name, 'muestras': self.muestras_coleccion,
+                     'inicial': self.coleccion_inicial, 'ultima': self.coleccion_ultima,
+                     'final': self.coleccion_final, 'max': self.coleccion_maximos or None}
+        if self.coleccion_inicial and self.coleccion_final:
+            coleccion['delta'] = {
+                clave: self.coleccion_final[clave] - self.coleccion_inicial[clave]
+                for clave in ('documentos', 'bytes', 'almacenamiento_bytes', 'indices_bytes')
+            }
+        return {
+            'disponible': True,
+            'intervalo_s': self.intervalo_s,
+            'muestras': self.muestras,
+            'segundos': round(segundos, 3),
+            'contadores': contadores,
+            'medidas': medidas,
+            'coleccion': coleccion,
+            'error': self.error,
+        }
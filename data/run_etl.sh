@@ -52,27 +52,37 @@ if [ ! -f "/app/$GOOGLE_FILE" ]; then
   else
     sh /app/scripts/download_google.sh || true
   fi
-
-  # Convertir CSV.GZ a GeoJSON si es necesario
-  if [ ! -f "/app/$GOOGLE_FILE" ] && [ -f "/app/samples/google_part1.csv.gz" ]; then
-    echo "[ETL] Convirtiendo Google CSV.GZ a GeoJSON..."
-    python3 /app/scripts/convert_csv_to_geojson.py \
-      /app/samples/google_part1.csv.gz \
-      /app/samples/google_part2.csv.gz \
-      /app/samples/google_part3.csv.gz \
-      /app/samples/google_part4.csv.gz \
-      /app/samples/google_buildings.geojson
-  fi
 fi
 
 # ================================================
 # PASO 4: Cargar footprints CON FILTRO PDET
 # ================================================
-echo "[ETL] PASO 4: Cargando Google footprints (solo PDET)..."
-python3 /app/cargar_google_footprints.py
+GOOGLE_ARGS=()
+if [ ! -f "/app/$GOOGLE_FILE" ] && [ -f "/app/samples/google_part1.csv.gz" ]; then
+  # Las partes CSV.GZ se cargan directamente, sin convertirlas antes a GeoJSON
+  GOOGLE_ARGS=(
+    /app/samples/google_part1.csv.gz
+    /app/samples/google_part2.csv.gz
+    /app/samples/google_part3.csv.gz
+    /app/samples/google_part4.csv.gz
+  )
+fi
 
-echo "[ETL] PASO 5: Cargando Microsoft footprints (solo PDET)..."
-python3 /app/cargar_microsoft_footprints.py
+if [ "${ETL_CONCURRENTE:-0}" = "1" ]; then
+  # Ambas fuentes en simultáneo, con un único índice PDET en memoria compartida
+  echo "[ETL] PASOS 4 y 5: Cargando Google y Microsoft footprints en paralelo (solo PDET)..."
+  if [ ${#GOOGLE_ARGS[@]} -gt 0 ]; then
+    python3 /app/cargar_footprints.py --google "${GOOGLE_ARGS[@]}"
+  else
+    python3 /app/cargar_footprints.py
+  fi
+else
+  echo "[ETL] PASO 4: Cargando Google footprints (solo PDET)..."
+  python3 /app/cargar_google_footprints.py ${GOOGLE_ARGS[@]+"${GOOGLE_ARGS[@]}"}
+
+  echo "[ETL] PASO 5: Cargando Microsoft footprints (solo PDET)..."
+  python3 /app/cargar_microsoft_footprints.py
+fi
 
 # ================================================
 # PASO 6: Análisis EDA
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark del lector en streaming de FeatureCollection.
+
+Mide MB/s y features/seg del lector por bloques (`footprints.geojson_stream`)
+sobre un FeatureCollection completo y del lector carácter por carácter
+anterior sobre los primeros --mb-legado MB (sobre el archivo completo tardaría
+horas). Si el archivo no existe se genera uno sintético del tamaño pedido
+con polígonos parecidos a los de Microsoft.
+
+Usage:
+  python3 benchmark_geojson_stream.py /tmp/bench.geojson [--gb 2] [--mb-legado 20]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from footprints.geojson_stream import iter_features_raw  # noqa: E402
+
+
+def iter_features_legado(path, limite_bytes=None):
+    """Lector anterior de los cargadores (f.read(1) + obj_buf += ch)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ''
+        while True:
+            chunk = f.read(8192)
+            if not chunk:
+                return
+            buf += chunk
+            idx = buf.find('"features"')
+            if idx != -1:
+                arr_idx = buf.find('[', idx)
+                if arr_idx != -1:
+                    consumed = len(buf[:arr_idx+1])
+                    f.seek(f.tell() - len(buf) + consumed)
+                    break
+        depth = 0
+        in_str = False
+        escape = False
+        obj_buf = ''
+        leidos = 0
+        while True:
+            ch = f.read(1)
+            if not ch:
+                break
+            leidos += 1
+            if in_str:
+                obj_buf += ch
+                if escape:
+                    escape = False
+                elif ch == '\\':
+                    escape = True
+                elif ch == '"':
+                    in_str = False
+                continue
+            if ch == '{':
+                depth += 1
+                obj_buf += ch
+            elif ch == '}':
+                depth -= 1
+                obj_buf += ch
+                if depth == 0:
+                    yield obj_buf, leidos
+                    obj_buf = ''
+                    if limite_bytes and leidos >= limite_bytes:
+                        return
+            elif ch == '"':
+                in_str = True
+                obj_buf += ch
+            else:
+                if depth > 0:
+                    obj_buf += ch
+
+
+def generar(path, gb, seed=7):
+    """Escribe un FeatureCollection sintético de ~gb GB."""
+    rng = random.Random(seed)
+    objetivo = int(gb * 1024 ** 3)
+    escritos = 0
+    print(f"▶ Generando {path} (~{gb} GB)...")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"type":"FeatureCollection","features":[\n')
+        primero = True
+        while escritos < objetivo:
+            x = rng.uniform(-79, -67)
+            y = rng.uniform(-4, 12)
+            n = rng.randint(4, 40)
+            ring = [[round(x + 0.0001 * rng.random(), 7), round(y + 0.0001 * rng.random(), 7)] for _ in range(n)]
+            ring.append(ring[0])
+            feat = json.dumps({'type': 'Feature', 'properties': {'height': -1, 'confidence': -1},
+                               'geometry': {'type': 'Polygon', 'coordinates': [ring]}})
+            if not primero:
+                f.write(',\n')
+            f.write(feat)
+            escritos += len(feat) + 2
+            primero = False
+        f.write('\n]}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', help='FeatureCollection de entrada (se genera si no existe)')
+    parser.add_argument('--gb', type=float, default=2.0, help='Tamaño del archivo sintético')
+    parser.add_argument('--mb-legado', type=float, default=20.0, help='MB a leer con el lector anterior')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        generar(args.path, args.gb)
+    tamano = os.path.getsize(args.path)
+    print(f"✓ Archivo: {args.path} ({tamano / 1024 ** 2:,.0f} MB)")
+
+    t0 = time.perf_counter()
+    n = 0
+    for _ in iter_features_raw(args.path):
+        n += 1
+    dt = time.perf_counter() - t0
+    mbs_nuevo = tamano / 1024 ** 2 / dt
+    print(f"  por bloques:   {mbs_nuevo:>10,.1f} MB/s  {n / dt:>12,.0f} features/seg  ({n:,} features, {dt:.1f} s)")
+
+    limite = int(args.mb_legado * 1024 ** 2)
+    t0 = time.perf_counter()
+    n = 0
+    leidos = 0
+    for _, leidos in iter_features_legado(args.path, limite):
+        n += 1
+    dt = time.perf_counter() - t0
+    mbs_legado = leidos / 1024 ** 2 / dt if dt else 0
+    print(f"  char por char: {mbs_legado:>10,.1f} MB/s  {n / dt:>12,.0f} features/seg  ({n:,} features, {dt:.1f} s)")
+    if mbs_legado:
+        print(f"  Aceleración: {mbs_nuevo / mbs_legado:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
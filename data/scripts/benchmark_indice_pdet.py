@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la asignación de municipio PDET: búsqueda lineal vs STRtree.
+
+Genera puntos aleatorios dentro del bbox de todos los municipios PDET (la
+mayoría cae fuera de PDET, como ocurre con los footprints reales) y mide
+features/seg con el recorrido lineal original y con `IndiceMunicipios`.
+
+Usage:
+  python3 benchmark_indice_pdet.py [--n 20000] [--geojson municipios_pdet.geojson | --cache-dir cache/pdet]
+
+Sin --geojson lee los municipios desde la colección `mgn_municipios_pdet`;
+con --cache-dir los abre del artefacto del índice PDET que dejan los
+cargadores (sin consultar MongoDB).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import shapely
+from shapely.geometry import shape, Point
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from footprints.indice_pdet import IndiceMunicipios, cargar_municipios_shapes  # noqa: E402
+from footprints.cache_pdet import abrir_ultimo_artefacto  # noqa: E402
+
+
+def find_municipio_lineal(lat, lon, municipios_list):
+    """Recorrido lineal original de los cargadores (línea base)."""
+    point = Point(lon, lat)
+    for mpio in municipios_list:
+        try:
+            if mpio['shape'].contains(point):
+                return mpio['codigo']
+        except Exception:
+            continue
+    return None
+
+
+def municipios_desde_geojson(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        fc = json.load(f)
+    return [{
+        'codigo': feat['properties'].get('codigo_municipio'),
+        'nombre': feat['properties'].get('nombre_municipio', ''),
+        'shape': shape(feat['geometry'])
+    } for feat in fc.get('features', [])]
+
+
+def municipios_desde_artefacto(directorio):
+    grilla = abrir_ultimo_artefacto(directorio)
+    if grilla is None:
+        return []
+    indice = grilla.indice_pdet
+    return [{'codigo': c, 'nombre': n, 'shape': g}
+            for c, n, g in zip(indice.codigos, indice.nombres, indice.geoms)]
+
+
+def municipios_desde_mongo(mongo_uri, db_name):
+    from pymongo import MongoClient
+    client = MongoClient(mongo_uri)
+    try:
+        return cargar_municipios_shapes(client[db_name]['mgn_municipios_pdet'])
+    finally:
+        client.close()
+
+
+def medir(nombre, fn, puntos):
+    t0 = time.perf_counter()
+    resultados = [fn(lon, lat) for lon, lat in puntos]
+    dt = time.perf_counter() - t0
+    print(f"  {nombre:<10} {len(puntos) / dt:>12,.0f} features/seg  ({dt:.2f} s)")
+    return resultados, dt
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=20000, help='Número de puntos aleatorios')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--geojson', help='FeatureCollection de municipios PDET (en vez de MongoDB)')
+    parser.add_argument('--cache-dir', help='Directorio del artefacto del índice PDET (p. ej. cache/pdet)')
+    parser.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://mongo-upme:27017/'))
+    parser.add_argument('--db', default=os.getenv('DB_NAME', 'dba_proyectofinal'))
+    args = parser.parse_args()
+
+    if args.geojson:
+        municipios_shapes = municipios_desde_geojson(args.geojson)
+    elif args.cache_dir:
+        municipios_shapes = municipios_desde_artefacto(args.cache_dir)
+    else:
+        municipios_shapes = municipios_desde_mongo(args.mongo_uri, args.db)
+    if not municipios_shapes:
+        print("✗ ERROR: no hay municipios PDET para el benchmark")
+        sys.exit(1)
+
+    minx, miny, maxx, maxy = shapely.total_bounds([m['shape'] for m in municipios_shapes])
+    rng = np.random.default_rng(args.seed)
+    puntos = list(zip(rng.uniform(minx, maxx, args.n), rng.uniform(miny, maxy, args.n)))
+
+    print(f"Asignación de municipio para {args.n:,} puntos ({len(municipios_shapes)} municipios):")
+    # La línea base se mide antes de construir el índice: `shapely.prepare`
+    # prepara las geometrías en sitio y aceleraría también el recorrido lineal.
+    lineal, dt_lineal = medir('lineal', lambda lon, lat: find_municipio_lineal(lat, lon, municipios_shapes), puntos)
+
+    t0 = time.perf_counter()
+    indice = IndiceMunicipios(municipios_shapes)
+    print(f"  (índice construido en {time.perf_counter() - t0:.3f} s)")
+    strtree, dt_strtree = medir('STRtree', indice.buscar, puntos)
+
+    dentro = sum(1 for c in strtree if c is not None)
+    print(f"\n  En PDET: {dentro:,} / {args.n:,}")
+    print(f"  Aceleración: {dt_lineal / dt_strtree:.1f}x")
+    if lineal != strtree:
+        diferencias = sum(1 for a, b in zip(lineal, strtree) if a != b)
+        print(f"✗ ERROR: {diferencias} asignaciones difieren entre lineal y STRtree")
+        sys.exit(1)
+    print("✓ Asignaciones idénticas")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,84 +13,8 @@ import csv
 import json
 from pathlib import Path
 
-
-def wkt_to_geojson_coords(wkt_str):
-    """Convert WKT POLYGON string to GeoJSON coordinates array.
-    Example WKT: POLYGON((-68.123 4.567, -68.124 4.568, ...))
-    or: POLYGON ((-68.123 4.567, -68.124 4.568, ...))
-    """
-    try:
-        # Remove 'POLYGON' prefix and clean up
-        wkt_clean = wkt_str.strip()
-        if wkt_clean.upper().startswith('POLYGON'):
-            wkt_clean = wkt_clean[7:].strip()  # Remove 'POLYGON'
-        
-        # Remove outer parentheses - handle both "(" and "(("
-        wkt_clean = wkt_clean.strip()
-        if wkt_clean.startswith('(('):
-            wkt_clean = wkt_clean[2:-2]  # Remove "((" and "))"
-        elif wkt_clean.startswith('('):
-            wkt_clean = wkt_clean[1:-1]  # Remove "(" and ")"
-        
-        # Split by comma to get coordinate pairs
-        pairs = wkt_clean.split(',')
-        coords = []
-        for pair in pairs:
-            parts = pair.strip().split()
-            if len(parts) >= 2:
-                try:
-                    lon = float(parts[0])
-                    lat = float(parts[1])
-                    coords.append([lon, lat])
-                except ValueError:
-                    continue
-        
-        if len(coords) < 3:  # A polygon needs at least 3 points
-            return None
-        
-        return [coords]  # Polygon exterior ring
-    except Exception as e:
-        print(f"  ⚠ Error parsing WKT: {wkt_str[:50]}... - {e}")
-        return None
-
-
-def csv_row_to_feature(row, row_num):
-    """Convert CSV row to GeoJSON Feature.
-    Expected columns: geometry (WKT) or latitude/longitude, plus other properties.
-    """
-    try:
-        # Try to find geometry column (WKT format)
-        geom = None
-        properties = {}
-        
-        for key, val in row.items():
-            key_lower = key.lower()
-            if key_lower in ('geometry', 'geom', 'wkt'):
-                # Parse WKT
-                coords = wkt_to_geojson_coords(val)
-                if coords:
-                    geom = {'type': 'Polygon', 'coordinates': coords}
-            elif key_lower == 'latitude' and 'longitude' in [k.lower() for k in row.keys()]:
-                # Point geometry from lat/lon
-                lat = float(val)
-                lon = float(row.get('longitude') or row.get('Longitude') or row.get('LONGITUDE'))
-                # For buildings we expect polygons, but if only point available, skip or use point
-                # For now, skip rows with only lat/lon (buildings should have polygons)
-                continue
-            else:
-                properties[key] = val
-        
-        if geom is None:
-            return None
-        
-        return {
-            'type': 'Feature',
-            'geometry': geom,
-            'properties': properties
-        }
-    except Exception as e:
-        print(f"  ⚠ Error en fila {row_num}: {e}")
-        return None
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from footprints.google_csv import csv_row_to_feature  # noqa: E402
 
 
 def convert_csv_gz_to_geojson(input_paths, output_path):
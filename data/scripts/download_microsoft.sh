@@ -34,16 +34,8 @@ if [[ "$DRIVE_URL" =~ drive\.google\.com ]]; then
     if [ $? -eq 0 ]; then
         echo "✓ Microsoft footprints descargados exitosamente"
         ls -lh "$OUTPUT_FILE"
-        # Convertir a GeoJSON (FeatureCollection) para compatibilidad con loaders que esperan un único objeto
-        CONVERTED="$(dirname "$OUTPUT_FILE")/sample_microsoft.geojson"
-        echo "▶ Convirtiendo $OUTPUT_FILE -> $CONVERTED"
-        python3 /app/scripts/convert_geojsonl_to_geojson.py "/app/$OUTPUT_FILE" "/app/${CONVERTED}"
-        if [ $? -eq 0 ]; then
-            echo "✓ Conversión completada: $CONVERTED"
-        else
-            echo "⚠ ERROR: Falló la conversión a GeoJSON" >&2
-            exit 1
-        fi
+        # El cargador lee el GeoJSONL directamente por rangos de bytes (mmap);
+        # ya no se convierte a FeatureCollection.
     else
         echo "✗ ERROR: Fallo la descarga con gdown"
         exit 1
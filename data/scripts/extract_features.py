@@ -1,57 +1,11 @@
 #!/usr/bin/env python3
 import sys
 import json
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from footprints.geojson_stream import iter_features_from_featurecollection  # noqa: E402
 
-def iter_features_from_featurecollection(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        buf = ''
-        while True:
-            chunk = f.read(8192)
-            if not chunk:
-                return
-            buf += chunk
-            idx = buf.find('"features"')
-            if idx != -1:
-                arr_idx = buf.find('[', idx)
-                if arr_idx != -1:
-                    consumed = len(buf[:arr_idx+1])
-                    f.seek(f.tell() - len(buf) + consumed)
-                    break
-        depth = 0
-        in_str = False
-        escape = False
-        obj_buf = ''
-        while True:
-            ch = f.read(1)
-            if not ch:
-                break
-            if in_str:
-                obj_buf += ch
-                if escape:
-                    escape = False
-                elif ch == '\\':
-                    escape = True
-                elif ch == '"':
-                    in_str = False
-                continue
-            if ch == '{':
-                depth += 1
-                obj_buf += ch
-            elif ch == '}':
-                depth -= 1
-                obj_buf += ch
-                if depth == 0:
-                    try:
-                        yield json.loads(obj_buf)
-                    except Exception:
-                        pass
-                    obj_buf = ''
-            elif ch == '"':
-                in_str = True
-                obj_buf += ch
-            else:
-                if depth > 0:
-                    obj_buf += ch
 
 def extract(input_path, output_path, n):
     n = int(n)
@@ -7,54 +7,27 @@ Usage:
 import os
 import sys
 import argparse
+from pathlib import Path
+
 from pymongo import MongoClient, UpdateOne
-from shapely.geometry import shape, mapping, Polygon, MultiPolygon
-from shapely.geometry.polygon import orient
+from shapely.geometry import shape, mapping
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from footprints.geometria import normalizar_geometrias  # noqa: E402
+from footprints.perfilador import perfilar  # noqa: E402
 
 
-def normalize_shapely_geom_obj(g):
-    try:
-        if g.is_valid:
-            return g
-    except Exception:
-        pass
-    try:
-        from shapely.ops import make_valid
-        g2 = make_valid(g)
-        if g2.is_valid:
-            return g2
-    except Exception:
+def normalize_geojson_geoms(geoms_json):
+    """Normalize a list of GeoJSON geometries in one vectorized pass.
+    Returns a list with the normalized GeoJSON (or None if unparseable/unfixable).
+    """
+    shapes = []
+    for geom_json in geoms_json:
         try:
-            g2 = g.buffer(0)
-            if g2.is_valid:
-                return g2
+            shapes.append(shape(geom_json))
         except Exception:
-            return None
-    try:
-        g2 = g.buffer(0)
-        if g2.is_valid:
-            return g2
-    except Exception:
-        return None
-    return None
-
-
-def normalize_geojson_geom(geom_json):
-    try:
-        g = shape(geom_json)
-    except Exception:
-        return None
-    g2 = normalize_shapely_geom_obj(g)
-    if g2 is None:
-        return None
-    try:
-        if isinstance(g2, Polygon):
-            g2 = orient(g2, sign=1.0)
-        elif isinstance(g2, MultiPolygon):
-            g2 = MultiPolygon([orient(p, sign=1.0) for p in g2.geoms])
-    except Exception:
-        pass
-    return mapping(g2)
+            shapes.append(None)
+    return [mapping(g) if g is not None else None for g in normalizar_geometrias(shapes)]
 
 
 def main():
@@ -65,6 +38,7 @@ def main():
     parser.add_argument('--batch-size', type=int, default=2000)
     parser.add_argument('--dry-run', action='store_true')
     args = parser.parse_args()
+    perfilar('fix_invalid_geometries')
 
     client = MongoClient(args.mongo_uri)
     db = client[args.db]
@@ -74,30 +48,35 @@ def main():
         total = coll.count_documents({})
         print(f"Processing collection {coll_name} ({total} documents)")
         cursor = coll.find({}, {'geometry': 1}).batch_size(args.batch_size)
-        ops = []
         processed = 0
         fixed = 0
         skipped = 0
+
+        def process_batch(docs):
+            nonlocal fixed, skipped
+            ops = []
+            for doc, new_geom in zip(docs, normalize_geojson_geoms([d['geometry'] for d in docs])):
+                if new_geom is None:
+                    skipped += 1
+                    continue
+                if new_geom != doc['geometry']:
+                    fixed += 1
+                    ops.append(UpdateOne({'_id': doc['_id']}, {'$set': {'geometry': new_geom}}))
+            if ops and not args.dry_run:
+                coll.bulk_write(ops)
+
+        batch = []
         for doc in cursor:
             processed += 1
-            geom = doc.get('geometry')
-            if not geom:
+            if not doc.get('geometry'):
                 skipped += 1
                 continue
-            new_geom = normalize_geojson_geom(geom)
-            if new_geom is None:
-                skipped += 1
-                continue
-            if new_geom != geom:
-                fixed += 1
-                if not args.dry_run:
-                    ops.append(UpdateOne({'_id': doc['_id']}, {'$set': {'geometry': new_geom}}))
-            if len(ops) >= args.batch_size:
-                if not args.dry_run:
-                    coll.bulk_write(ops)
-                ops = []
-        if ops and not args.dry_run:
-            coll.bulk_write(ops)
+            batch.append(doc)
+            if len(batch) >= args.batch_size:
+                process_batch(batch)
+                batch = []
+        if batch:
+            process_batch(batch)
         print(f"  Processed: {processed}, Fixed: {fixed}, Skipped (no geom or unfixable): {skipped}")
 
     client.close()
@@ -109,3 +109,31 @@ print("\n========================================")
 print("VERIFICACIÓN COMPLETADA")
 print("========================================")
 '
+
+# Manifiestos de las últimas cargas (los escriben los cargadores en data/manifiestos)
+echo ""
+echo "⏱️  ÚLTIMAS CARGAS:"
+echo "═══════════════════"
+for col in buildings_google buildings_microsoft; do
+  ultimo=$(ls -t data/manifiestos/${col}_*.json 2>/dev/null | head -1)
+  if [ -z "$ultimo" ]; then
+    echo "  $col: sin manifiesto"
+    continue
+  fi
+  python3 - "$ultimo" <<'PY'
+import json, sys
+m = json.load(open(sys.argv[1], encoding='utf-8'))
+estado = '✓' if m['resultado'] == 'ok' else '✗'
+print(f"  {estado} {m['coleccion']} ({m['carga_id']}): {m['resultado']}, {m['duracion_s']:.0f} s, "
+      f"{m['conteos']['procesados']:,} procesados ({m['items_por_s'] or 0:,.0f}/s), "
+      f"{m['escritura']['insertados']:,} insertados, RSS máx {max(m['rss_max_mb'].values()):,.0f} MB")
+for nombre, e in sorted(m['etapas'].items(), key=lambda kv: -kv[1]['pared_s'])[:3]:
+    print(f"      {nombre}: {e['pared_s']:.1f} s")
+s = m.get('servidor') or {}
+if s.get('disponible'):
+    c = s['contadores']
+    sucios = s['medidas'].get('cache_bytes_sucios', {}).get('max') or 0
+    print(f"      servidor: {c.get('inserts', {}).get('delta', 0):,} inserts, "
+          f"{c.get('checkpoints', {}).get('delta', 0):,} checkpoints, caché sucia máx {sucios / 1024**2:,.0f} MB")
+PY
+done